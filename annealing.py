@@ -0,0 +1,155 @@
+"""Simulated annealing with tabu memory and restarts. Used instead of testing all layouts layer by layer if `USE_ANNEALING` is enabled.
+
+A chain starts with a random layout and keeps swapping two random letters. Swaps that improve the score are always performed,
+worse ones only with a probability that shrinks with the temperature (which slowly goes down during a round).
+Swapping the same two positions back right away is forbidden for a while (tabu), unless it leads to a new best layout.
+After every round, the chain climbs to the nearest local optimum and restarts with a shaken-up version of its best layout.
+Fixated letters never move. The chain stops when its time is up and returns the best layouts it came across."""
+import heapq
+import math
+import random
+from time import perf_counter
+
+from delta_scoring import SwapScorer, getPositions, MIN_IMPROVEMENT
+
+# The number of swaps in one round, while the temperature goes from `START_TEMPERATURE` to `END_TEMPERATURE`.
+ROUND_LENGTH = 50000
+# Temperatures, relative to the average score-change of a random swap
+START_TEMPERATURE = 1.0
+END_TEMPERATURE = 0.001
+# The number of swaps two positions can't be swapped again after they were swapped.
+TABU_TENURE = 10
+# The share of the movable letters that are swapped randomly when the chain restarts with its best layout
+RESTART_SHAKE = 0.25
+# How often (in swaps) the time is checked
+TIME_CHECK_INTERVAL = 1000
+
+
+class BestLayouts:
+    """The `nrOfBest` best different layouts a chain came across."""
+
+    def __init__(self, nrOfBest: int):
+        self.nrOfBest = nrOfBest
+        # (score, layout), the worst one first
+        self.heap = []
+        self.layouts = set()
+
+    def getThreshold(self) -> float:
+        """Returns the score a layout has to beat to be added."""
+        return self.heap[0][0] if len(self.heap) >= self.nrOfBest else -math.inf
+
+    def add(self, score: float, layout: str) -> None:
+        """Adds a layout if it is better than the worst kept one and not kept already."""
+        if layout in self.layouts:
+            return
+        self.layouts.add(layout)
+        if len(self.heap) < self.nrOfBest:
+            heapq.heappush(self.heap, (score, layout))
+        else:
+            _, removedLayout = heapq.heappushpop(self.heap, (score, layout))
+            self.layouts.discard(removedLayout)
+
+
+def getRandomLayout(letters: str, fixedLetters: dict, rng: random.Random) -> list:
+    """Places the fixated letters at their positions and all other letters randomly."""
+    looseLetters = list(letters)
+    for letter in fixedLetters.values():
+        looseLetters.remove(letter)
+    rng.shuffle(looseLetters)
+    return [fixedLetters[position] if position in fixedLetters else looseLetters.pop() for position in range(len(letters))]
+
+
+def getStartTemperature(swapScorer: SwapScorer, layout: list, movablePositions: list, rng: random.Random) -> float:
+    """Returns the average absolute score-change of random swaps, which the temperatures are relative to."""
+    layoutString = ''.join(layout)
+    positions = getPositions(layoutString)
+    deltas = [abs(swapScorer.getSwapDelta(layoutString, positions, *rng.sample(movablePositions, 2))) for _ in range(200)]
+    return max(sum(deltas) / len(deltas), 1e-12)
+
+
+def descend(swapScorer: SwapScorer, layout: list, movablePositions: list) -> float:
+    """Performs the best-improving swap of movable letters until there is none left. Returns the total score-change."""
+    totalDelta = 0.0
+    while True:
+        matrix = swapScorer.getSwapDeltaMatrix(''.join(layout))
+        bestSwap = (MIN_IMPROVEMENT, 0, 0)
+        for i, idx1 in enumerate(movablePositions):
+            row = matrix[idx1]
+            for idx2 in movablePositions[i+1:]:
+                if row[idx2] > bestSwap[0]:
+                    bestSwap = (float(row[idx2]), idx1, idx2)
+        delta, idx1, idx2 = bestSwap
+        if delta <= MIN_IMPROVEMENT:
+            return totalDelta
+        layout[idx1], layout[idx2] = layout[idx2], layout[idx1]
+        totalDelta += delta
+
+
+def runChain(letters: str, fixedLetters: dict, bigrams: tuple, timeLimit: float, seed: str, nrOfBest: int) -> tuple:
+    """Runs one chain for `timeLimit` seconds.
+    `letters` are all letters of the layout (including fill-symbols) and `fixedLetters` is {position: letter}.
+    Returns the best layouts as (score, layout)-entries and what the chain did: {name: count}"""
+    endTime = perf_counter() + timeLimit
+    rng = random.Random(seed)
+    swapScorer = SwapScorer(bigrams)
+    movablePositions = [position for position in range(len(letters)) if position not in fixedLetters]
+    bestLayouts = BestLayouts(nrOfBest)
+    stats = {'swaps': 0, 'acceptedSwaps': 0, 'tabuSwaps': 0, 'restarts': 0}
+    if len(movablePositions) < 2:
+        layout = ''.join(getRandomLayout(letters, fixedLetters, rng))
+        bestLayouts.add(0.0, layout)
+        return bestLayouts.heap, stats
+
+    layout = getRandomLayout(letters, fixedLetters, rng)
+    # Scores are relative to the starting layout. (Only their order matters, the final scores are calculated from scratch)
+    score = 0.0
+    bestLayout, bestScore = list(layout), score
+    baseTemperature = getStartTemperature(swapScorer, layout, movablePositions, rng)
+    tabuUntil = [[0]*len(letters) for _ in letters]
+    positions = getPositions(''.join(layout))
+
+    step = 0
+    while True:
+        for roundStep in range(ROUND_LENGTH):
+            if step % TIME_CHECK_INTERVAL == 0 and perf_counter() > endTime:
+                return bestLayouts.heap, stats
+            step += 1
+            temperature = baseTemperature * START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE)**(roundStep / ROUND_LENGTH)
+
+            idx1, idx2 = sorted(rng.sample(movablePositions, 2))
+            if layout[idx1] == layout[idx2]:
+                continue
+            stats['swaps'] += 1
+            delta = swapScorer.getSwapDelta(layout, positions, idx1, idx2)
+            if tabuUntil[idx1][idx2] > step and score + delta <= bestScore:
+                stats['tabuSwaps'] += 1
+                continue
+            if delta < 0 and rng.random() >= math.exp(delta / temperature):
+                continue
+
+            stats['acceptedSwaps'] += 1
+            layout[idx1], layout[idx2] = layout[idx2], layout[idx1]
+            positions[ord(layout[idx1])], positions[ord(layout[idx2])] = idx1, idx2
+            tabuUntil[idx1][idx2] = step + TABU_TENURE
+            score += delta
+            if score > bestScore:
+                bestLayout, bestScore = list(layout), score
+            if score > bestLayouts.getThreshold():
+                bestLayouts.add(score, ''.join(layout))
+
+        # Finish the round in the nearest local optimum
+        score += descend(swapScorer, layout, movablePositions)
+        bestLayouts.add(score, ''.join(layout))
+        if score > bestScore:
+            bestLayout, bestScore = list(layout), score
+
+        # Restart with a shaken-up version of the best layout
+        stats['restarts'] += 1
+        layout, score = list(bestLayout), bestScore
+        positions = getPositions(''.join(layout))
+        for _ in range(max(1, int(len(movablePositions) * RESTART_SHAKE))):
+            idx1, idx2 = rng.sample(movablePositions, 2)
+            if layout[idx1] != layout[idx2]:
+                score += swapScorer.getSwapDelta(layout, positions, idx1, idx2)
+                layout[idx1], layout[idx2] = layout[idx2], layout[idx1]
+                positions[ord(layout[idx1])], positions[ord(layout[idx2])] = idx1, idx2
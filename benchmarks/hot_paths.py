@@ -0,0 +1,302 @@
+"""Times the functions of `main.py` that most of a run is spent in, so changes to them can be compared.
+
+The benchmarks use synthetic bigram-files instead of real ones, so every run measures exactly the same work:
+The letters' frequencies follow a Zipf-distribution (`--skew`) over an alphabet of `--alphabet-size` letters,
+and the bigram-frequencies are the product of their letters' frequencies with some (seeded) noise.
+
+Every benchmark runs in its own process, so their peak memory can be measured separately.
+The results are printed and can be written as JSON, to compare them across commits, interpreters and backends:
+    python benchmarks/hot_paths.py --output before.json
+    (change something)
+    python benchmarks/hot_paths.py --output after.json --compare before.json
+    pypy3 benchmarks/hot_paths.py --numpy --only getLayoutScores greedyOptimization"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from time import perf_counter
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The letters of the synthetic alphabets, from most to least frequent. The non-ascii letters make sure `asciify()` is used as well.
+SYNTHETIC_LETTERS = 'etaoinsrhldcumfpgwybvkxjqzäöüéèàçñåøαβγδεζηθικλμνξπρστυφχψω'
+
+
+def writeSyntheticBigrams(path: str, alphabetSize: int, skew: float, seed: int) -> None:
+    """Writes a bigram-file of the alphabet's first `alphabetSize` letters, sorted by frequency like the real ones."""
+    rng = random.Random(seed)
+    letters = SYNTHETIC_LETTERS[:alphabetSize]
+    letterFrequencies = [1 / (rank + 1)**skew for rank in range(alphabetSize)]
+    bigrams = []
+    for letter1, frequency1 in zip(letters, letterFrequencies):
+        for letter2, frequency2 in zip(letters, letterFrequencies):
+            bigrams.append((round(frequency1 * frequency2 * rng.uniform(0.5, 1.5) * 1e9), letter1 + letter2))
+    bigrams.sort(reverse=True)
+    with open(path, 'w', encoding='utf-8') as bigramFile:
+        bigramFile.writelines(f'{bigram} {frequency}\n' for frequency, bigram in bigrams)
+
+
+###########################################################################################################################
+# Everything below this line (except `main()`) runs in the benchmark processes, after `main.py` was imported with the synthetic bigrams.
+
+
+def getLayers(main, alphabetSize: int) -> tuple:
+    """Returns the (asciified) letters of the four layers, from the most to the least frequent ones. Missing letters are filled up."""
+    letters = main.asciify(SYNTHETIC_LETTERS[:min(alphabetSize, 4*main.LETTERS_PER_LAYER)])
+    return tuple(letters[beginning:beginning + main.LETTERS_PER_LAYER].ljust(main.LETTERS_PER_LAYER, main.FILL_SYMBOL)
+                 for beginning in range(0, 4*main.LETTERS_PER_LAYER, main.LETTERS_PER_LAYER))
+
+
+def getLayer2Stage(main, arguments) -> tuple:
+    """Returns what the layer 2 stage of a cycle works with: (the best layer 1 layouts, their scores, all layer 2 permutations)"""
+    layers = getLayers(main, arguments.alphabet_size)
+    layer1layouts = main.getPermutations(layers[0][1:], (layers[0][0],))
+    layer1layouts, layer1scores = main.getLayoutScores(tuple(layer1layouts), main.getBigrams(''.join(sorted(layers[0]))))
+    prefixes = tuple(layer1layouts[-arguments.prefixes:])
+    prevScores = layer1scores[-arguments.prefixes:]
+    return prefixes, prevScores, main.getPermutations(layers[1])
+
+
+def getLayer2Bigrams(main, prefixes: tuple, permutations) -> tuple:
+    """Returns the bigrams that are tested in the layer 2 stage."""
+    bigrams = main.getBigrams(''.join(sorted(prefixes[0] + permutations[0])))
+    return main.filterBigrams(bigrams, [permutations[0]])
+
+
+def benchmarkGetBigrams(main, arguments) -> dict:
+    """Looks up the bigrams of random 16-letter-sets. The bigram-cache is emptied first, so every lookup reads the corpus."""
+    rng = random.Random(arguments.seed)
+    letters = ''.join(getLayers(main, arguments.alphabet_size)).replace(main.FILL_SYMBOL, '')
+    letterSets = [''.join(sorted(rng.sample(letters, min(16, len(letters))))) for _ in range(arguments.bigram_lookups)]
+    main.bigramCache = main.LRUCache(0)
+
+    beginning = perf_counter()
+    for letterSet in letterSets:
+        main.getBigrams(letterSet)
+    return {'seconds': perf_counter() - beginning, 'bigramEvaluations': sum(len(letterSet)**2 for letterSet in letterSets)}
+
+
+def benchmarkFillAndPermuteLayout(main, arguments) -> dict:
+    """Creates all orderings of a layer 4 that is only partially filled, like it happens for most alphabets."""
+    layer4letters = getLayers(main, arguments.alphabet_size)[3].replace(main.FILL_SYMBOL, '')[:main.LETTERS_PER_LAYER - 2]
+
+    beginning = perf_counter()
+    nrOfLayouts = sum(1 for _ in main.fillAndPermuteLayout(layer4letters))
+    return {'seconds': perf_counter() - beginning, 'layouts': nrOfLayouts}
+
+
+def benchmarkGetLayoutScores(main, arguments) -> dict:
+    """Scores complete layer 1 + layer 2 layouts with `getLayoutScores()`, the way `testLayouts()` does it."""
+    prefixes, prevScores, permutations = getLayer2Stage(main, arguments)
+    # Scoring every combination of layers 1 and 2 this way would take much longer than the separable scoring, so only a few prefixes are used.
+    nrOfPrefixes = max(1, arguments.prefixes // 50)
+    layouts = tuple(main.combinePermutations(prefixes[:nrOfPrefixes], permutations))
+    bigrams = getLayer2Bigrams(main, prefixes, permutations)
+
+    beginning = perf_counter()
+    main.getLayoutScores(layouts, bigrams, prevScores[:nrOfPrefixes])
+    return {'seconds': perf_counter() - beginning, 'layouts': len(layouts), 'bigramEvaluations': len(layouts) * len(bigrams)}
+
+
+def benchmarkCombinePermutations(main, arguments) -> dict:
+    """Creates all combinations of the layer 1 layouts and the layer 2 permutations as strings."""
+    prefixes, _, permutations = getLayer2Stage(main, arguments)
+
+    beginning = perf_counter()
+    nrOfLayouts = sum(1 for _ in main.combinePermutations(prefixes, permutations))
+    return {'seconds': perf_counter() - beginning, 'layouts': nrOfLayouts}
+
+
+def benchmarkTestCombinedLayouts(main, arguments) -> dict:
+    """Runs the complete layer 2 stage of a cycle: all combinations of the layer 1 layouts and the layer 2 permutations."""
+    prefixes, prevScores, permutations = getLayer2Stage(main, arguments)
+    bigrams = getLayer2Bigrams(main, prefixes, permutations)
+
+    beginning = perf_counter()
+    main.testCombinedLayouts(prefixes, prevScores, permutations)
+    nrOfLayouts = len(prefixes) * len(permutations)
+    return {'seconds': perf_counter() - beginning, 'layouts': nrOfLayouts, 'bigramEvaluations': nrOfLayouts * len(bigrams)}
+
+
+def benchmarkGetTopScores(main, arguments) -> dict:
+    """Selects the best layouts out of the scores of a complete layer 2 stage."""
+    prefixes, _, permutations = getLayer2Stage(main, arguments)
+    layouts = main.CombinedLayouts(prefixes, permutations)
+    rng = random.Random(arguments.seed)
+    scores = main.array('d', (rng.random() for _ in range(len(layouts))))
+
+    beginning = perf_counter()
+    main.getTopScores(layouts, scores, main.NR_OF_STAGE_RESULTS)
+    return {'seconds': perf_counter() - beginning, 'layouts': len(layouts)}
+
+
+def benchmarkGreedyOptimization(main, arguments) -> dict:
+    """Climbs from random full layouts (the letters only move within their layers) to their local optima."""
+    rng = random.Random(arguments.seed)
+    layers = getLayers(main, arguments.alphabet_size)
+    layouts = tuple(''.join(''.join(rng.sample(layer, len(layer))) for layer in layers) for _ in range(arguments.greedy_layouts))
+    bigrams = main.getBigrams(''.join(sorted(layouts[0])))
+    scores = main.array('d', (main.testSingleLayout(layout, main.getAsciiArray(), bigrams) for layout in layouts))
+    info = main.InfoWithTime('Greedy optimization')
+
+    beginning = perf_counter()
+    main.greedyOptimization(layouts, scores, info)
+    return {'seconds': perf_counter() - beginning, 'layouts': len(layouts)}
+
+
+BENCHMARKS = {
+    'getBigrams': benchmarkGetBigrams,
+    'fillAndPermuteLayout': benchmarkFillAndPermuteLayout,
+    'getLayoutScores': benchmarkGetLayoutScores,
+    'combinePermutations': benchmarkCombinePermutations,
+    'testCombinedLayouts': benchmarkTestCombinedLayouts,
+    'getTopScores': benchmarkGetTopScores,
+    'greedyOptimization': benchmarkGreedyOptimization,
+}
+
+
+def getPeakMemory() -> int:
+    """Returns the peak resident set size of this process in KiB. (`None` where it can't be measured, like on Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def runBenchmark(arguments) -> None:
+    """Runs one benchmark and prints its result as JSON (on the last line)."""
+    import config
+    from helper_classes import BigramsConfig
+    config.BIGRAMS_CONFIGS = (BigramsConfig(name='Synthetic', weight=100, path=arguments.corpus),)
+    config.COMPILED_BIGRAMS_DIRECTORY = os.path.dirname(arguments.corpus)
+    config.USE_NUMPY = arguments.numpy
+    config.USE_SEPARABLE_SCORING = not arguments.no_separable
+    config.USE_MULTIPROCESSING = False
+    config.DEBUG_MODE = False
+    import main
+
+    result = BENCHMARKS[arguments.benchmark](main, arguments)
+    result['peakMemoryKiB'] = getPeakMemory()
+    print('\n' + json.dumps(result))
+
+
+###########################################################################################################################
+
+
+def getCommit() -> str:
+    """Returns the current git commit (`None` if it can't be found)."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPOSITORY_DIRECTORY,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def getThroughput(amount, seconds: float) -> float:
+    """Returns how many of something were done per second. (`None` if it wasn't counted)"""
+    if amount is None or seconds <= 0:
+        return None
+    return amount / seconds
+
+
+def getSpeedup(previousResult: dict, result: dict) -> float:
+    """Returns how many times faster `result` is than `previousResult`.
+    Throughputs are compared if possible, so results of different sizes can be compared as well."""
+    for key in ('layoutsPerSecond', 'bigramEvaluationsPerSecond'):
+        if previousResult.get(key) and result.get(key):
+            return result[key] / previousResult[key]
+    return previousResult['seconds'] / result['seconds']
+
+
+def formatNumber(number) -> str:
+    """Formats a throughput for the table."""
+    if number is None:
+        return '-'
+    for limit, suffix in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if number >= limit:
+            return f'{number / limit:.2f}{suffix}'
+    return f'{number:.1f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the hot functions of main.py on synthetic bigrams.')
+    parser.add_argument('--only', nargs='+', choices=tuple(BENCHMARKS), default=tuple(BENCHMARKS), help='the benchmarks to run (default: all)')
+    parser.add_argument('--alphabet-size', type=int, default=40, help=f'number of letters of the synthetic alphabet (default: 40, at most {len(SYNTHETIC_LETTERS)})')
+    parser.add_argument('--skew', type=float, default=1.0, help='exponent of the letter-frequencies\' Zipf-distribution (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the synthetic bigrams and layouts (default: 1)')
+    parser.add_argument('--prefixes', type=int, default=500, help='number of layer 1 layouts combined with every layer 2 permutation (default: 500)')
+    parser.add_argument('--greedy-layouts', type=int, default=1000, help='number of layouts to optimize greedily (default: 1000)')
+    parser.add_argument('--bigram-lookups', type=int, default=200, help='number of bigram-lookups (default: 200)')
+    parser.add_argument('--numpy', action='store_true', help='use the NumPy backend (USE_NUMPY)')
+    parser.add_argument('--no-separable', action='store_true', help='disable USE_SEPARABLE_SCORING')
+    parser.add_argument('--output', help='write the results to this JSON-file')
+    parser.add_argument('--compare', help='compare the results with the ones of an earlier JSON-file')
+    parser.add_argument('--benchmark', choices=tuple(BENCHMARKS), help=argparse.SUPPRESS)
+    parser.add_argument('--corpus', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if not 8 <= arguments.alphabet_size <= len(SYNTHETIC_LETTERS):
+        parser.error(f'--alphabet-size has to be between 8 and {len(SYNTHETIC_LETTERS)}.')
+    if arguments.benchmark:
+        sys.path.insert(0, REPOSITORY_DIRECTORY)
+        runBenchmark(arguments)
+        return
+
+    settings = {
+        'alphabetSize': arguments.alphabet_size, 'skew': arguments.skew, 'seed': arguments.seed, 'prefixes': arguments.prefixes,
+        'greedyLayouts': arguments.greedy_layouts, 'bigramLookups': arguments.bigram_lookups,
+        'backend': 'numpy' if arguments.numpy else 'python', 'separableScoring': not arguments.no_separable,
+    }
+    report = {
+        'commit': getCommit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'interpreter': f'{platform.python_implementation()} {platform.python_version()}',
+        'platform': platform.platform(),
+        'settings': settings,
+        'results': dict(),
+    }
+    previousResults = dict()
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as comparedFile:
+            previousReport = json.load(comparedFile)
+        previousResults = previousReport['results']
+        if previousReport['settings'] != settings:
+            print(f"Warning: {arguments.compare} was created with different settings: {previousReport['settings']}")
+
+    print(f"{'benchmark':<22}{'seconds':>10}{'layouts/s':>12}{'bigrams/s':>12}{'peak MiB':>10}" + ('  speedup' if previousResults else ''))
+    with tempfile.TemporaryDirectory() as directory:
+        corpusPath = os.path.join(directory, 'synthetic_bigrams.txt')
+        writeSyntheticBigrams(corpusPath, arguments.alphabet_size, arguments.skew, arguments.seed)
+
+        for name in arguments.only:
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--benchmark', name, '--corpus', corpusPath],
+                                     cwd=directory, capture_output=True, text=True)
+            if process.returncode != 0:
+                print(process.stderr, end='')
+                sys.exit(f'FAILED: the benchmark {name} crashed.')
+            result = json.loads(process.stdout.splitlines()[-1])
+            result['layoutsPerSecond'] = getThroughput(result.get('layouts'), result['seconds'])
+            result['bigramEvaluationsPerSecond'] = getThroughput(result.get('bigramEvaluations'), result['seconds'])
+            report['results'][name] = result
+
+            peakMemory = f"{result['peakMemoryKiB'] / 1024:.1f}" if result['peakMemoryKiB'] is not None else '-'
+            line = (f"{name:<22}{result['seconds']:>10.3f}{formatNumber(result['layoutsPerSecond']):>12}"
+                    f"{formatNumber(result['bigramEvaluationsPerSecond']):>12}{peakMemory:>10}")
+            if name in previousResults:
+                line += f"{getSpeedup(previousResults[name], result):>8.2f}x"
+            print(line)
+
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as outputFile:
+            json.dump(report, outputFile, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measures how long it takes to import `main.py` and fails if startup got slower.
+
+Every measurement imports `main.py` in a fresh interpreter, so nothing is cached between them (apart from the `.pyc`-files).
+Besides the time, it checks that importing doesn't do any real work: no bigram-file may be read
+and NumPy may only be imported if `USE_NUMPY` is enabled.
+
+Usage: python benchmarks/startup.py [--runs 10] [--limit 0.15]
+The exit code is 1 if the median import time is above the limit or one of the checks fails."""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh interpreter and prints its measurements as JSON.
+MEASUREMENT_CODE = '''
+import json, sys, time
+beginning = time.perf_counter()
+import main
+duration = time.perf_counter() - beginning
+import bigram_corpus, config
+print(json.dumps({
+    'seconds': duration,
+    'loadedCorpora': len(bigram_corpus.loadedCorpora),
+    'useNumpy': config.USE_NUMPY,
+    'numpyImported': 'numpy' in sys.modules,
+}))
+'''
+
+
+def measureImport() -> dict:
+    """Imports `main.py` in a fresh interpreter and returns its measurements."""
+    process = subprocess.run([sys.executable, '-c', MEASUREMENT_CODE], cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True)
+    if process.returncode != 0:
+        print(process.stderr, end='')
+        sys.exit('FAILED: main.py could not be imported.')
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def getProblems(measurement: dict) -> list:
+    """Returns a description of everything that was done during the import although it shouldn't have been."""
+    problems = []
+    if measurement['loadedCorpora']:
+        problems.append(f"{measurement['loadedCorpora']} bigram-file(s) were read during the import.")
+    if measurement['numpyImported'] and not measurement['useNumpy']:
+        problems.append('NumPy was imported although USE_NUMPY is disabled.')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures how long it takes to import main.py.')
+    parser.add_argument('--runs', type=int, default=10, help='number of fresh interpreters to measure (default: 10)')
+    parser.add_argument('--limit', type=float, default=0.15, help='the highest acceptable median import time in seconds (default: 0.15)')
+    arguments = parser.parse_args()
+
+    # The first import may have to write the `.pyc`-files, so it's not measured.
+    measureImport()
+    measurements = [measureImport() for _ in range(arguments.runs)]
+    durations = [measurement['seconds'] for measurement in measurements]
+    median = statistics.median(durations)
+    print(f'Import of main.py: median {median*1000:.1f} ms, min {min(durations)*1000:.1f} ms, max {max(durations)*1000:.1f} ms '
+          f'({arguments.runs} runs)')
+
+    problems = getProblems(measurements[-1])
+    if median > arguments.limit:
+        problems.append(f'The median import time is above the limit of {arguments.limit*1000:.1f} ms.')
+    for problem in problems:
+        print(f'FAILED: {problem}')
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
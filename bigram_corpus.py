@@ -0,0 +1,220 @@
+"""Compiled bigram files.
+
+Reading and parsing the bigram text files is slow, so each of them is compiled into a binary file the first time it's used.
+The compiled file is memory-mapped, so it's never parsed again and all processes share the same memory.
+It is rebuilt automatically when the bigram file changes (its modification time and hash are stored in the compiled file).
+
+Format of a compiled file:
+- header (see `HEADER`)
+- symbol table: all characters of the bigrams (UTF-8), padded to a multiple of 8 bytes
+- dense frequency matrix: `frequencies[i*nrSymbols + j]` is the frequency of the bigram `symbols[i] + symbols[j]` (doubles)
+- last frequencies: the frequency of the last line of each entry's bigram (doubles, see `BigramCorpus.itemsOfLastLines()`)
+- entries: the bigrams of the text file as `i*nrSymbols + j`, in the order they appear in the text file (unsigned ints)"""
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+
+from config import COMPILED_BIGRAMS_DIRECTORY
+
+MAGIC = b'8VBG'
+VERSION = 2
+# magic, version, source mtime (ns), source size, source sha256, nr of symbols, symbol table size, nr of entries, (padding), frequency total
+HEADER = struct.Struct('<4sIqq32sIIIId')
+
+
+class BigramCorpus:
+    """A memory-mapped, compiled bigram file. Frequencies are the raw ones of the text file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.compiledPath = getCompiledPath(path)
+        if not isUpToDate(path, self.compiledPath):
+            compileBigramFile(path, self.compiledPath)
+
+        with open(self.compiledPath, 'rb') as compiledFile:
+            self.map = mmap.mmap(compiledFile.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, _, _, self.sourceHash, nrSymbols, symbolTableSize, nrEntries, _, self.total = HEADER.unpack_from(self.map)
+        offset = HEADER.size
+        self.symbols = bytes(self.map[offset:offset + symbolTableSize]).rstrip(b'\0').decode('utf-8')
+        self.symbolIndices = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+        offset += getPaddedSize(symbolTableSize)
+        buffer = memoryview(self.map)
+        self.frequencies = buffer[offset:offset + 8*nrSymbols*nrSymbols].cast('d')
+        offset += 8*nrSymbols*nrSymbols
+        self.lastFrequencies = buffer[offset:offset + 8*nrEntries].cast('d')
+        offset += 8*nrEntries
+        self.entries = buffer[offset:offset + 4*nrEntries].cast('I')
+        # ranks[i*nrSymbols + j]: the position of the bigram in the file (-1 if it isn't in the file)
+        self.ranks = array('l', [-1]) * (nrSymbols*nrSymbols)
+        for rank, entry in enumerate(self.entries):
+            self.ranks[entry] = rank
+
+    def getFrequency(self, bigram: str) -> float:
+        """Returns the frequency of a bigram. (0 if it isn't in the file)"""
+        idx1 = self.symbolIndices.get(bigram[0])
+        idx2 = self.symbolIndices.get(bigram[1])
+        if idx1 is None or idx2 is None:
+            return 0.0
+        return self.frequencies[idx1*len(self.symbols) + idx2]
+
+    def getBigramsOf(self, letters: str) -> list:
+        """Returns (bigram, frequency) for all bigrams of the file that only consist of `letters`, in the order of the file.
+        Only the pairs of `letters` are looked up, the rest of the file is never touched."""
+        nrSymbols = len(self.symbols)
+        indices = [self.symbolIndices[letter] for letter in dict.fromkeys(letters) if letter in self.symbolIndices]
+        found = []
+        for idx1 in indices:
+            rowBeginning = idx1*nrSymbols
+            for idx2 in indices:
+                rank = self.ranks[rowBeginning + idx2]
+                if rank >= 0:
+                    found.append((rank, rowBeginning + idx2))
+        found.sort()
+        return [(self.symbols[entry // nrSymbols] + self.symbols[entry % nrSymbols], self.frequencies[entry]) for _, entry in found]
+
+    def itemsOfLastLines(self):
+        """Yields (bigram, frequency) for all bigrams of the file, in the order of the file.
+        Unlike everywhere else, a bigram that appears on multiple lines (e.g. upper- and lowercase) has the frequency of its last line.
+        The monograms (and with them the auto-generated layers) have always been counted like this."""
+        nrSymbols = len(self.symbols)
+        for entry, lastFrequency in zip(self.entries, self.lastFrequencies):
+            idx1, idx2 = divmod(entry, nrSymbols)
+            yield self.symbols[idx1] + self.symbols[idx2], lastFrequency
+
+
+# {path: BigramCorpus}
+loadedCorpora = dict()
+
+
+def loadCorpus(path: str) -> BigramCorpus:
+    """Returns the compiled version of a bigram file. Each file is only loaded once."""
+    if path not in loadedCorpora:
+        loadedCorpora[path] = BigramCorpus(path)
+    return loadedCorpora[path]
+
+
+def getWeightedBigrams(letters: str, configs: tuple) -> list:
+    """Returns (bigram, frequency) for all bigrams that only consist of `letters`.
+    The frequencies of each config's corpus are normalized and weighted, then summed up.
+    All configs with the same path (for example the per-language stats and the optimizer) share one loaded corpus."""
+    weightedBigrams = dict()
+    for config in configs:
+        if config.weight <= 0:
+            continue
+        corpus = loadCorpus(config.path)
+        for bigram, frequency in corpus.getBigramsOf(letters):
+            normalizedFrequency = frequency * config.weight / corpus.total
+            if bigram not in weightedBigrams:
+                weightedBigrams[bigram] = normalizedFrequency
+            else:
+                weightedBigrams[bigram] += normalizedFrequency
+    return list(weightedBigrams.items())
+
+
+def getFrequencyMatrix(letters: str, configs: tuple) -> tuple:
+    """Returns all bigrams that only consist of `letters` and a (configs × bigrams)-matrix of their frequencies.
+    `matrix[k][j]` is the normalized frequency of `bigrams[j]` in the corpus of `configs[k]`, as if the config's weight was 100.
+    (A weighted sum of the rows is what `getWeightedBigrams()` returns)"""
+    columns = dict()
+    rowEntries = []
+    for config in configs:
+        corpus = loadCorpus(config.path)
+        rowEntries.append([
+            (columns.setdefault(bigram, len(columns)), frequency * 100 / corpus.total)
+            for bigram, frequency in corpus.getBigramsOf(letters)])
+
+    matrix = []
+    for entries in rowEntries:
+        row = array('d', [0.0]) * len(columns)
+        for column, frequency in entries:
+            row[column] = frequency
+        matrix.append(row)
+    return tuple(columns), tuple(matrix)
+
+
+def getCompiledPath(path: str) -> str:
+    """Returns where the compiled version of a bigram file is stored."""
+    pathHash = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(COMPILED_BIGRAMS_DIRECTORY, f'{os.path.basename(path)}.{pathHash}.bin')
+
+
+def getFileHash(path: str) -> bytes:
+    """Returns the sha256-hash of a file."""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).digest()
+
+
+def getPaddedSize(size: int) -> int:
+    """Rounds up to a multiple of 8 bytes, so the frequency matrix is aligned."""
+    return (size + 7) // 8 * 8
+
+
+def isUpToDate(path: str, compiledPath: str) -> bool:
+    """Returns whether the compiled file belongs to the current version of the bigram file.
+    If only the modification time changed but not the content, the compiled file is kept (and its modification time updated)."""
+    if not os.path.exists(compiledPath):
+        return False
+    with open(compiledPath, 'rb') as compiledFile:
+        header = compiledFile.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return False
+    magic, version, mtime, size, digest, *_ = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return False
+    sourceStat = os.stat(path)
+    if sourceStat.st_mtime_ns == mtime and sourceStat.st_size == size:
+        return True
+    if sourceStat.st_size != size or getFileHash(path) != digest:
+        return False
+    with open(compiledPath, 'r+b') as compiledFile:
+        compiledFile.seek(8)
+        compiledFile.write(struct.pack('<q', sourceStat.st_mtime_ns))
+    return True
+
+
+def compileBigramFile(path: str, compiledPath: str) -> None:
+    """Parses a bigram text file and writes its compiled version."""
+    sourceStat = os.stat(path)
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    # {bigram: frequency} in the order of the file. Bigrams that appear multiple times (e.g. upper- and lowercase) are summed up.
+    bigrams = dict()
+    # {bigram: frequency of its last line}
+    lastFrequencies = dict()
+    total = 0.0
+    for line in content.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        frequency = float(line[line.find(' ')+1:])
+        total += frequency
+        bigram = line[:2].lower()
+        bigrams[bigram] = bigrams.get(bigram, 0.0) + frequency
+        lastFrequencies[bigram] = frequency
+
+    symbols = ''.join(dict.fromkeys(''.join(bigrams)))
+    symbolIndices = {symbol: idx for idx, symbol in enumerate(symbols)}
+    nrSymbols = len(symbols)
+    frequencies = array('d', [0.0]) * (nrSymbols*nrSymbols)
+    entries = array('I')
+    for bigram, frequency in bigrams.items():
+        entry = symbolIndices[bigram[0]]*nrSymbols + symbolIndices[bigram[1]]
+        frequencies[entry] = frequency
+        entries.append(entry)
+
+    symbolTable = symbols.encode('utf-8')
+    header = HEADER.pack(MAGIC, VERSION, sourceStat.st_mtime_ns, sourceStat.st_size, hashlib.sha256(content).digest(),
+                         nrSymbols, len(symbolTable), len(entries), 0, total)
+
+    # Write to a temporary file first, so other processes never see a half-written file.
+    os.makedirs(os.path.dirname(compiledPath) or '.', exist_ok=True)
+    temporaryPath = f'{compiledPath}.{os.getpid()}.tmp'
+    with open(temporaryPath, 'wb') as compiledFile:
+        compiledFile.write(header)
+        compiledFile.write(symbolTable.ljust(getPaddedSize(len(symbolTable)), b'\0'))
+        compiledFile.write(frequencies.tobytes())
+        compiledFile.write(array('d', lastFrequencies.values()).tobytes())
+        compiledFile.write(entries.tobytes())
+    os.replace(temporaryPath, compiledPath)
@@ -0,0 +1,47 @@
+"""Checkpoints of a running optimization, so that an interrupted run can be resumed.
+
+A checkpoint is written after every cycle of layers 1 and 2 and after layers 3 and 4.
+It holds the results of the finished parts of the run and the run's fingerprint (see `fingerprints.py`).
+It is only used to resume a run with the same fingerprint; otherwise the run starts from scratch."""
+import os
+import pickle
+
+from config import CHECKPOINT_FILE
+
+CHECKPOINT_VERSION = 1
+
+
+def loadCheckpoint(fingerprint: str) -> dict:
+    """Returns the state of the last checkpoint of a run with this fingerprint, or `None` if there is none."""
+    if not os.path.exists(CHECKPOINT_FILE):
+        return None
+    try:
+        with open(CHECKPOINT_FILE, 'rb') as checkpointFile:
+            version, checkpointFingerprint, state = pickle.load(checkpointFile)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if version != CHECKPOINT_VERSION or checkpointFingerprint != fingerprint:
+        return None
+    return state
+
+
+def saveCheckpoint(fingerprint: str, state: dict) -> None:
+    """Writes a checkpoint. The file is replaced at once, so an interruption never leaves a broken checkpoint behind."""
+    dumpAtomically(CHECKPOINT_FILE, (CHECKPOINT_VERSION, fingerprint, state))
+
+
+def dumpAtomically(path: str, content) -> None:
+    """Pickles `content` into a temporary file first and then replaces the file at `path` with it."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporaryPath = f'{path}.{os.getpid()}.tmp'
+    with open(temporaryPath, 'wb') as file:
+        pickle.dump(content, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporaryPath, path)
+
+
+def removeCheckpoint() -> None:
+    """Removes the checkpoint once the run is finished."""
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
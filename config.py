@@ -61,6 +61,11 @@ VAR_LETTERS_L1_L2 = 'nsrhld'.lower()
 FIXATED_LETTERS = ('e', '', '', '', '', '', '', '') # the positions go clockwise. 'e' is on the bottom left.
 #FIXATED_LETTERS = ('', '', '', '', '', '', '', '')
 
+# Skip layouts that are just rotated or mirrored versions of other layouts.
+# The symmetries are detected automatically from the score list, so this works with any score list. (Without symmetries, nothing is skipped)
+# When a letter is fixated, only the symmetries that keep it in place are used.
+SKIP_SYMMETRIC_LAYOUTS = True
+
 # Define how many layers the layouts you recieve should contain.
 NR_OF_LAYERS = 4
 # Define how many of the best layer-versions should be used to generate the next layer's layouts.
@@ -97,8 +102,91 @@ DISABLE_UNICODE = False
 # Ignore this variable:
 DEBUG_MODE = False
 
+# Score the combinations of layers by splitting their bigrams into the ones within the new layer (scored once per permutation)
+# and the ones between the new layer and the previous layers (read from small per-layout tables).
+# This is much faster. Set to `False` to score every combined layout from scratch.
+USE_SEPARABLE_SCORING = True
+
 # Use Multiprocessing (disable this when using `pypy3 main.py`)
 USE_MULTIPROCESSING = False
+# The number of worker processes used for multiprocessing. `0` uses one process per CPU core.
+NR_OF_PROCESSES = 0
+# The maximum number of layouts a worker process tests at once.
+# Smaller chunks spread the work more evenly between the processes, larger chunks have less overhead.
+MULTIPROCESSING_CHUNK_SIZE = 50000
+# Give each worker process whole cycles (of layers 1 and 2) instead of splitting up the layouts of every cycle.
+# This is faster when there are many cycles (see `AUTO_LAYER_SWAP_COUNT`). The results stay exactly the same.
+PARALLEL_CYCLES = True
+
+# Use NumPy to score whole batches of layouts at once. Requires `numpy` to be installed.
+# The results are exactly the same as without NumPy. (disable this when using `pypy3 main.py`)
+USE_NUMPY = False
+# The number of layouts that are scored together when using NumPy. Higher values need more memory.
+NUMPY_CHUNK_SIZE = 20000
+
+# Search the best possible layout with an exact branch-and-bound search after the optimization, starting with the best layout found.
+# It proves an upper bound for the score of the best possible layout, so you know how far "The King" is from the optimum at most.
+# (If it finds a better layout, that layout is added to the results.)
+USE_EXACT_SOLVER = False
+# Stop the exact search after this many seconds and report the best layout and the gap found so far. `0` means no limit.
+EXACT_SOLVER_TIME_LIMIT = 600
+# Stop the exact search as soon as no layout can be better than the best one found by more than this (in %).
+EXACT_SOLVER_GAP = 0
+
+# Search with simulated annealing (with tabu memory and restarts) instead of testing all layouts layer by layer.
+# Letters can move to any position that isn't fixated. It takes exactly `ANNEALING_TIME_LIMIT` seconds, no matter how many letters there are,
+# but it can't guarantee to find the same layouts as the full search. Runs with the same seed try the same swaps.
+USE_ANNEALING = False
+# The time (in seconds) the search may take.
+ANNEALING_TIME_LIMIT = 60
+ANNEALING_SEED = 0
+# The number of independent chains. They run in parallel when using multiprocessing. `0` uses one chain per process.
+ANNEALING_CHAINS = 0
+
+# Stop the optimization after this many seconds and show the best layouts found until then. `0` means no limit.
+# Cycles that haven't started yet are skipped, the current layer stops testing layouts and the greedy optimization stops climbing.
+# Each remaining layer still tests the combinations with the best layouts, so the run can take a little longer than this.
+# A run that was cut short isn't saved as finished (see `USE_CHECKPOINTS` and `USE_RESULT_CACHE`).
+DEADLINE = 0
+
+# The bigram-lists are compiled into a binary format the first time they're used, which makes loading them much faster.
+# The compiled files are stored in this directory. They are rebuilt automatically whenever a bigram-list changes.
+COMPILED_BIGRAMS_DIRECTORY = './bigram_dictionaries/compiled'
+
+# The maximum number of bigram-lists (one per combination of letters and languages) that are kept in memory.
+# The least recently used ones are removed first. `0` means no limit.
+BIGRAM_CACHE_SIZE = 256
+
+# The greedy optimization remembers which local optimum every layout it went through leads to, so that climbs which meet stop at once.
+# This is the maximum number of remembered layouts (about 170 bytes each). The least recently used ones are removed first. `0` means no limit.
+GREEDY_TABLE_SIZE = 200000
+
+# Save the progress after every cycle and layer, so that an interrupted run continues where it stopped when it's started again.
+# A checkpoint is only used if the letters, settings, bigram-lists and score list haven't changed.
+USE_CHECKPOINTS = False
+CHECKPOINT_FILE = './checkpoint.pickle'
+
+# Store the results of every run, so that running again with the same letters, settings, bigram-lists and score list
+# (for example after only changing what is displayed) shows the stored results instead of optimizing again.
+# Runs with `USE_ANNEALING` and runs that were cut short by the `DEADLINE` are never stored, since their results depend on the time.
+USE_RESULT_CACHE = False
+RESULT_CACHE_DIRECTORY = './result_cache'
+
+# Store the best layouts of every run with their score in each language in the `RESULT_CACHE_DIRECTORY`,
+# so they can be re-ranked with other weights later (see `RERANK_STORED_LAYOUTS`). `0` doesn't store any layouts.
+# This is the maximum number of stored layouts per language: only the best ones in each language are kept.
+# (Each stored layout is a few hundred bytes and is re-ranked in every re-ranking run)
+RESULT_CACHE_CANDIDATES = 0
+# Show the best layouts that earlier runs (with the same letters, fixated letters, bigram-lists and score list) stored,
+# ranked by the current weights of the `BIGRAMS_CONFIGS`, instead of optimizing again. This only takes a moment.
+# This needs `RESULT_CACHE_CANDIDATES`. If there are no stored layouts yet, the optimization runs as usual.
+RERANK_STORED_LAYOUTS = False
+# The number of the best re-ranked layouts that are improved with the greedy optimization afterwards. `0` only re-ranks them.
+RERANK_GREEDY_LAYOUTS = 100
+
+# Write a report of the run (time, memory, number of scored layouts, cache hits, ... of every phase) as a JSON-file.
+WRITE_RUN_REPORT = False
+RUN_REPORT_FILE = './run_report.json'
 
 # Symbol used for filling up layer 4. If your alphabet or your bigram-list for some reason contains "-", change "-" to something else.
 FILL_SYMBOL = '-'
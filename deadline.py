@@ -0,0 +1,41 @@
+"""The time limit of a whole run (`DEADLINE` in the `config.py`).
+
+When the deadline is reached, every stage stops testing new chunks of layouts and keeps the best ones it has found so far,
+cycles that haven't started yet are skipped and the greedy optimization stops climbing.
+The end time is an absolute `time()`, so worker processes can check it, too. (They get it as an argument)"""
+from time import time
+
+# The time at which the optimization has to stop. `None` if there is no deadline.
+endTimeHolder = [None]
+
+
+def start(seconds: float) -> None:
+    """Sets the deadline to `seconds` from now. (`0` means there is no deadline)"""
+    endTimeHolder[0] = time() + seconds if seconds else None
+
+
+def getEndTime() -> float:
+    """Returns the end time, which can be handed to worker processes. (`None` if there is no deadline)"""
+    return endTimeHolder[0]
+
+
+def setEndTime(endTime: float) -> None:
+    """Sets the end time in a worker process."""
+    endTimeHolder[0] = endTime
+
+
+def isReached() -> bool:
+    """Returns whether the deadline has passed."""
+    return hasPassed(endTimeHolder[0])
+
+
+def hasPassed(endTime: float) -> bool:
+    """Returns whether the end time (as returned by `getEndTime()`) has passed. `None` never passes."""
+    return endTime is not None and time() >= endTime
+
+
+def getRemainingTime() -> float:
+    """Returns the seconds until the deadline (at least 0), or `None` if there is no deadline."""
+    if endTimeHolder[0] is None:
+        return None
+    return max(endTimeHolder[0] - time(), 0.0)
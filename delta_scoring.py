@@ -0,0 +1,200 @@
+"""Delta-evaluation of 2-letter-swaps. Used by the greedy optimization so that layouts don't have to be re-scored from scratch."""
+from config import SCORE_LIST, USE_NUMPY, GREEDY_TABLE_SIZE
+import numpy_scoring
+from lru_cache import LRUCache
+
+# A swap has to improve a layout's score by more than this to be performed.
+# Prevents endless loops caused by rounding errors of swaps that don't change anything.
+MIN_IMPROVEMENT = 1e-9
+
+
+class SwapScorer:
+    """Calculates how the score of a layout changes when two of its letters are swapped.
+    For every letter, it keeps an index of the bigrams that letter takes part in,
+    so only the bigrams that contain one of the swapped letters have to be looked at.
+    It also remembers which local optimum every layout it climbed through leads to, so climbs that meet a known path stop at once."""
+
+    def __init__(self, bigrams: tuple, tableSize: int = GREEDY_TABLE_SIZE):
+        # letter code -> [(other letter code, frequency of "letter+other", frequency of "other+letter"), ...]
+        self.neighbours = dict()
+        # letter code -> frequency of "letter+letter"
+        self.selfFrequencies = dict()
+        # (letter1 code, letter2 code) -> frequency
+        self.frequencies = dict()
+
+        for bigram in bigrams:
+            code1, code2 = bigram.letter1AsciiCode, bigram.letter2AsciiCode
+            if code1 == code2:
+                self.selfFrequencies[code1] = bigram.frequency
+            else:
+                self.frequencies[(code1, code2)] = bigram.frequency
+
+        for code1, code2 in self.frequencies:
+            for letter, other in ((code1, code2), (code2, code1)):
+                if letter not in self.neighbours:
+                    self.neighbours[letter] = dict()
+                self.neighbours[letter][other] = None
+        for letter, others in self.neighbours.items():
+            self.neighbours[letter] = tuple(
+                (other, self.frequencies.get((letter, other), 0.0), self.frequencies.get((other, letter), 0.0))
+                for other in others)
+
+        # How often `climb()` looked for the best swap and how many swaps it performed.
+        self.nrOfIterations = 0
+        self.nrOfMoves = 0
+        # {visited layout: the local optimum it leads to}
+        # The climbs are deterministic, so every layout always leads to the same optimum.
+        self.optima = LRUCache(tableSize)
+
+        # scoreColumns[idx] = [SCORE_LIST[0][idx], SCORE_LIST[1][idx], ...]
+        self.scoreColumns = tuple(tuple(row[idx] for row in SCORE_LIST) for idx in range(len(SCORE_LIST)))
+
+        if USE_NUMPY:
+            np = numpy_scoring.np
+            self.frequencyMatrix = np.zeros((256, 256), dtype=np.float64)
+            for bigram in bigrams:
+                self.frequencyMatrix[bigram.letter1AsciiCode, bigram.letter2AsciiCode] = bigram.frequency
+
+    def getSwapDelta(self, layout: str, positions: list, idx1: int, idx2: int) -> float:
+        """Returns the score-change of swapping the letters at the positions `idx1` and `idx2`.
+        `positions` maps the ascii-codes of `layout`'s letters to their positions. (See `getPositions()`)"""
+        code1, code2 = ord(layout[idx1]), ord(layout[idx2])
+        if code1 == code2:
+            return 0.0
+        delta = 0.0
+        for other, freqOut, freqIn in self.neighbours.get(code1, ()):
+            if other != code2:
+                otherIdx = positions[other]
+                delta += freqOut * (SCORE_LIST[idx2][otherIdx] - SCORE_LIST[idx1][otherIdx]) \
+                    + freqIn * (SCORE_LIST[otherIdx][idx2] - SCORE_LIST[otherIdx][idx1])
+        for other, freqOut, freqIn in self.neighbours.get(code2, ()):
+            if other != code1:
+                otherIdx = positions[other]
+                delta += freqOut * (SCORE_LIST[idx1][otherIdx] - SCORE_LIST[idx2][otherIdx]) \
+                    + freqIn * (SCORE_LIST[otherIdx][idx1] - SCORE_LIST[otherIdx][idx2])
+        # Bigrams that consist of only the swapped letters
+        selfFreqDiff = self.selfFrequencies.get(code1, 0.0) - self.selfFrequencies.get(code2, 0.0)
+        pairFreqDiff = self.frequencies.get((code1, code2), 0.0) - self.frequencies.get((code2, code1), 0.0)
+        delta += selfFreqDiff * (SCORE_LIST[idx2][idx2] - SCORE_LIST[idx1][idx1]) \
+            + pairFreqDiff * (SCORE_LIST[idx2][idx1] - SCORE_LIST[idx1][idx2])
+        return delta
+
+    def getSwapDeltaMatrix(self, layout: str):
+        """Returns the score-changes of all possible 2-letter-swaps.
+        `matrix[idx1][idx2]` is the score-change of swapping the letters at the positions `idx1` and `idx2`.
+        Only the values above the diagonal (`idx1 < idx2`) are meaningful."""
+        if USE_NUMPY:
+            return self.getSwapDeltaMatrix_numpy(layout)
+
+        positions = getPositions(layout)
+        nrPositions = len(layout)
+        codes = [ord(letter) for letter in layout]
+        contributions = [self.getContributions(code, positions, nrPositions) for code in codes]
+
+        matrix = [[0.0]*nrPositions for _ in range(nrPositions)]
+        for idx1 in range(nrPositions):
+            code1 = codes[idx1]
+            contributions1 = contributions[idx1]
+            for idx2 in range(idx1+1, nrPositions):
+                code2 = codes[idx2]
+                if code1 == code2:
+                    continue
+                contributions2 = contributions[idx2]
+                freq12 = self.frequencies.get((code1, code2), 0.0)
+                freq21 = self.frequencies.get((code2, code1), 0.0)
+                selfFreqDiff = self.selfFrequencies.get(code1, 0.0) - self.selfFrequencies.get(code2, 0.0)
+                score11, score12 = SCORE_LIST[idx1][idx1], SCORE_LIST[idx1][idx2]
+                score21, score22 = SCORE_LIST[idx2][idx1], SCORE_LIST[idx2][idx2]
+
+                delta = contributions1[idx2] - contributions1[idx1] + contributions2[idx1] - contributions2[idx2]
+                # The contributions contain the bigrams between the swapped letters, but with the old positions.
+                delta -= freq12 * (score22 - score12 + score11 - score12) + freq21 * (score22 - score21 + score11 - score21)
+                delta += selfFreqDiff * (score22 - score11) + (freq12 - freq21) * (score21 - score12)
+                matrix[idx1][idx2] = delta
+        return matrix
+
+    def getContributions(self, code: int, positions: list, nrPositions: int) -> list:
+        """Returns the scores the bigrams of a letter (with all other letters staying where they are)
+        would contribute if the letter were placed at each of the positions."""
+        contributions = [0.0]*nrPositions
+        for other, freqOut, freqIn in self.neighbours.get(code, ()):
+            otherIdx = positions[other]
+            contributions = [
+                contribution + freqOut*scoreTo + freqIn*scoreFrom
+                for contribution, scoreTo, scoreFrom
+                in zip(contributions, self.scoreColumns[otherIdx], SCORE_LIST[otherIdx])]
+        return contributions
+
+    def getSwapDeltaMatrix_numpy(self, layout: str):
+        """Vectorized version of `getSwapDeltaMatrix()`. Uses the swap-delta-formula of the quadratic assignment problem.
+        With A being the bigram-frequencies between positions and B being the scores between positions,
+        swapping the letters at the positions p and q changes the score by:
+        sum over k != p,q of (A[p,k]-A[q,k])(B[q,k]-B[p,k]) + (A[k,p]-A[k,q])(B[k,q]-B[k,p])
+        plus (A[p,p]-A[q,q])(B[q,q]-B[p,p]) + (A[p,q]-A[q,p])(B[q,p]-B[p,q])"""
+        np = numpy_scoring.np
+        nrPositions = len(layout)
+        codes = np.frombuffer(layout.encode('latin-1'), dtype=np.uint8)
+        A = self.frequencyMatrix[np.ix_(codes, codes)]
+        B = numpy_scoring.getScoreMatrix()[:nrPositions, :nrPositions]
+        a = np.diag(A)
+        b = np.diag(B)
+
+        AB = A @ B.T
+        ATB = A.T @ B
+        d = (A*B).sum(axis=1)
+        e = (A*B).sum(axis=0)
+        # Sums over all k (including p and q)
+        rows = AB + AB.T - d[:, None] - d[None, :]
+        columns = ATB + ATB.T - e[:, None] - e[None, :]
+        # Remove the k = p and k = q terms from these sums
+        rows -= (a[:, None] - A.T)*(B.T - b[:, None]) + (A - a[None, :])*(b[None, :] - B)
+        columns -= (a[:, None] - A)*(B - b[:, None]) + (A.T - a[None, :])*(b[None, :] - B.T)
+        # Bigrams that consist of only the swapped letters
+        pairs = (a[:, None] - a[None, :])*(b[None, :] - b[:, None]) + (A - A.T)*(B.T - B)
+        return rows + columns + pairs
+
+    def getBestSwap(self, layout: str) -> tuple:
+        """Returns (score-change, idx1, idx2) of the 2-letter-swap that improves `layout` the most."""
+        matrix = self.getSwapDeltaMatrix(layout)
+        bestSwap = (0.0, 0, 0)
+        for idx1 in range(len(layout)):
+            row = matrix[idx1]
+            for idx2 in range(idx1+1, len(layout)):
+                if row[idx2] > bestSwap[0]:
+                    bestSwap = (float(row[idx2]), idx1, idx2)
+        return bestSwap
+
+    def climb(self, layout: str) -> str:
+        """Performs the best-improving 2-letter-swap until no swap improves `layout` anymore. Returns the local optimum.
+        Stops as soon as it reaches a layout an earlier climb went through, and takes that climb's optimum."""
+        path = []
+        while True:
+            optimum = self.optima.get(layout)
+            if optimum is not None:
+                break
+            path.append(layout)
+            self.nrOfIterations += 1
+            delta, idx1, idx2 = self.getBestSwap(layout)
+            if delta <= MIN_IMPROVEMENT:
+                optimum = layout
+                break
+            self.nrOfMoves += 1
+            letters = list(layout)
+            letters[idx1], letters[idx2] = letters[idx2], letters[idx1]
+            layout = ''.join(letters)
+
+        for visitedLayout in path:
+            self.optima.put(visitedLayout, optimum)
+        return optimum
+
+    def getStats(self) -> dict:
+        """Returns how much work the climbs took, and how often they could stop early."""
+        return {'iterations': self.nrOfIterations, 'moves': self.nrOfMoves, 'tableHits': self.optima.hits, 'tableEvictions': self.optima.evictions}
+
+
+def getPositions(layout: str) -> list:
+    """Like `asciiArray`: maps the ascii-codes of the letters of `layout` to their positions."""
+    positions = [0]*256
+    for idx, letter in enumerate(layout):
+        positions[ord(letter)] = idx
+    return positions
@@ -0,0 +1,276 @@
+"""Exact branch-and-bound search for the best layout, with a proven upper bound on the best possible score.
+
+Scoring a layout is a quadratic assignment problem (bigram-frequencies between letters times `SCORE_LIST` between positions).
+The search fills the positions in order (layer by layer) and prunes partial layouts with Gilmore-Lawler bounds:
+- For every remaining letter and free position, the score the letter would get there is bounded by
+  its bigrams with the already placed letters (exact) plus its bigrams with the other remaining letters
+  (the largest frequencies paired with the largest scores of that position, which can never be beaten).
+- A linear assignment of the remaining letters to the free positions then bounds the whole partial layout.
+The assignment is also turned into a full layout, which often improves the best layout found so far.
+
+If the search is stopped early (time limit), the largest bound of the unexplored partial layouts is still a proven upper bound,
+so the gap between the best layout found and the best possible layout is known."""
+import math
+from time import time
+
+from config import SCORE_LIST, FILL_SYMBOL
+
+# Bounds that are at most this much better than the best layout found are not explored. (Rounding errors)
+BOUND_TOLERANCE = 1e-9
+
+
+class SolverResult:
+    """The outcome of `BranchAndBound.solve()`."""
+
+    def __init__(self, layout: str, score: float, upperBound: float, isComplete: bool, nrOfNodes: int, timeTaken: float):
+        self.layout = layout
+        self.score = score
+        # No layout can score higher than this.
+        self.upperBound = upperBound
+        # Whether the whole search tree was explored (and not stopped by the time limit)
+        self.isComplete = isComplete
+        self.nrOfNodes = nrOfNodes
+        self.timeTaken = timeTaken
+
+    @property
+    def gap(self) -> float:
+        """How much better the best possible layout could be, relative to the upper bound. (`inf` if there is no upper bound)"""
+        if not math.isfinite(self.upperBound) or not math.isfinite(self.score):
+            return float('inf')
+        if self.upperBound <= 0:
+            return 0.0
+        return max(0.0, (self.upperBound - self.score) / self.upperBound)
+
+
+class Node:
+    """A partial layout: the positions `order[:depth]` are filled, the letters in `remaining` still have to be placed."""
+
+    def __init__(self, depth: int, layout: list, remaining: tuple, nrOfEmpty: int, score: float, linear: dict):
+        self.depth = depth
+        self.layout = layout
+        self.remaining = remaining
+        self.nrOfEmpty = nrOfEmpty
+        # The score of the bigrams between the placed letters
+        self.score = score
+        # {letter: [score of the letter's bigrams with the placed letters (and itself) at each position]}
+        self.linear = linear
+
+
+class BranchAndBound:
+    """Searches the best layout of `letters` (plus fill-symbols) on `nrOfPositions` positions.
+    `fixedLetters` ({position: letter}) are never moved."""
+
+    def __init__(self, letters: str, bigrams: tuple, nrOfPositions: int, fixedLetters: dict = dict()):
+        self.letters = tuple(letter for letter in dict.fromkeys(letters) if letter != FILL_SYMBOL)
+        self.nrOfPositions = nrOfPositions
+        self.fixedLetters = fixedLetters
+        self.scores = [[float(score) for score in row[:nrOfPositions]] for row in SCORE_LIST[:nrOfPositions]]
+
+        # frequencies[letter1][letter2] of all bigrams between the letters
+        self.frequencies = {letter: dict() for letter in self.letters}
+        self.bigrams = []
+        for bigram in bigrams:
+            letter1, letter2 = chr(bigram.letter1AsciiCode), chr(bigram.letter2AsciiCode)
+            if letter1 in self.frequencies and letter2 in self.frequencies and bigram.frequency:
+                self.frequencies[letter1][letter2] = self.frequencies[letter1].get(letter2, 0.0) + bigram.frequency
+                self.bigrams.append((letter1, letter2, bigram.frequency))
+
+        # The positions in the order they are filled. (The fixed positions are filled beforehand)
+        self.order = [position for position in range(nrOfPositions) if position not in fixedLetters]
+        # sortedScores[depth][position]: the scores from `position` to the other free positions, from highest to lowest.
+        self.sortedScores = []
+        for depth in range(len(self.order) + 1):
+            freePositions = self.order[depth:]
+            self.sortedScores.append({
+                position: sorted((self.scores[position][other] for other in freePositions if other != position), reverse=True)
+                for position in freePositions})
+
+    def getScore(self, layout: str) -> float:
+        """Scores a full layout. (Same as `testSingleLayout()`)"""
+        positions = {letter: position for position, letter in enumerate(layout)}
+        return sum(frequency * self.scores[positions[letter1]][positions[letter2]] for letter1, letter2, frequency in self.bigrams)
+
+    def getRootNode(self) -> Node:
+        """Returns the partial layout that only contains the fixed letters."""
+        layout = [FILL_SYMBOL]*self.nrOfPositions
+        remaining = list(self.letters)
+        linear = {letter: [self.frequencies[letter].get(letter, 0.0) * self.scores[position][position]
+                           for position in range(self.nrOfPositions)] for letter in self.letters}
+        node = Node(0, layout, tuple(remaining), self.nrOfPositions - len(self.letters), 0.0, linear)
+        for position, letter in self.fixedLetters.items():
+            remaining.remove(letter)
+            node = self.placeLetter(node, letter, position, tuple(remaining), node.depth)
+        return node
+
+    def placeLetter(self, node: Node, letter: str, position: int, remaining: tuple, depth: int) -> Node:
+        """Returns the partial layout with `letter` placed at `position`."""
+        layout = list(node.layout)
+        if letter == FILL_SYMBOL:
+            return Node(depth, layout, remaining, node.nrOfEmpty - 1, node.score, node.linear)
+        layout[position] = letter
+        score = node.score + node.linear[letter][position]
+        linear = dict()
+        frequencies = self.frequencies[letter]
+        scoresFrom = self.scores[position]
+        for other in remaining:
+            freqOut = self.frequencies[other].get(letter, 0.0)
+            freqIn = frequencies.get(other, 0.0)
+            if freqOut or freqIn:
+                linear[other] = [value + freqOut*row[position] + freqIn*scoreFrom
+                                 for value, row, scoreFrom in zip(node.linear[other], self.scores, scoresFrom)]
+            else:
+                linear[other] = node.linear[other]
+        return Node(depth, layout, remaining, node.nrOfEmpty, score, linear)
+
+    def getBound(self, node: Node) -> tuple:
+        """Returns (upper bound, full layout of the assignment, {(letter, position): upper bound with that letter placed there})"""
+        freePositions = self.order[node.depth:]
+        remaining = node.remaining
+        sortedScores = self.sortedScores[node.depth]
+
+        # costs[row][column]: the bound of placing a letter (row) at a free position (column).
+        # Rows without a letter are empty slots. (They don't score anything)
+        costs = []
+        for letter in remaining:
+            frequencies = sorted((self.frequencies[letter].get(other, 0.0) for other in remaining if other != letter), reverse=True)
+            linear = node.linear[letter]
+            costs.append([linear[position] + sum([frequency*score for frequency, score in zip(frequencies, sortedScores[position])])
+                          for position in freePositions])
+        costs.extend([0.0]*len(freePositions) for _ in range(len(freePositions) - len(remaining)))
+
+        value, assignment, reducedCosts = maximizeAssignment(costs)
+        bound = node.score + value
+
+        layout = list(node.layout)
+        for row, column in enumerate(assignment[:len(remaining)]):
+            layout[freePositions[column]] = remaining[row]
+
+        childBounds = dict()
+        for row, letter in enumerate(remaining):
+            for column, position in enumerate(freePositions):
+                childBounds[(letter, position)] = bound - reducedCosts[row][column]
+        for column, position in enumerate(freePositions):
+            emptyRows = range(len(remaining), len(freePositions))
+            if emptyRows:
+                childBounds[(FILL_SYMBOL, position)] = bound - min(reducedCosts[row][column] for row in emptyRows)
+        return bound, ''.join(layout), childBounds
+
+    def solve(self, incumbent: str = None, timeLimit: float = 0, relativeGap: float = 0.0) -> SolverResult:
+        """Searches the best layout. `incumbent` is a (good) layout to start with.
+        Stops after `timeLimit` seconds (0 = no limit), or as soon as no layout can be better than the best one by more than `relativeGap`."""
+        start = time()
+        bestLayout, bestScore = None, float('-inf')
+        if incumbent is not None and self.isValidLayout(incumbent):
+            bestLayout, bestScore = incumbent, self.getScore(incumbent)
+
+        # Bounds of partial layouts that were skipped because of `relativeGap` are still part of the upper bound.
+        skippedBound = float('-inf')
+        nrOfNodes = 0
+        # (upper bound, parent node, letter) - the partial layouts are only created when they are explored.
+        stack = [(float('inf'), None, None)]
+        while stack:
+            # The root is always explored, so there is a (finite) upper bound even if the time limit is tiny.
+            if timeLimit and nrOfNodes > 0 and time() - start > timeLimit:
+                break
+            bound, parent, letter = stack.pop()
+            if parent is not None and isCloseEnough(bound, bestScore, relativeGap):
+                if bound > bestScore + BOUND_TOLERANCE:
+                    skippedBound = max(skippedBound, bound)
+                continue
+
+            if parent is None:
+                node = self.getRootNode()
+            else:
+                remaining = tuple(other for other in parent.remaining if other != letter)
+                node = self.placeLetter(parent, letter, self.order[parent.depth], remaining, parent.depth + 1)
+            nrOfNodes += 1
+
+            if not node.remaining:
+                # All letters are placed, the remaining positions stay empty.
+                if node.score > bestScore:
+                    bestLayout, bestScore = ''.join(node.layout), node.score
+                continue
+
+            bound, layout, childBounds = self.getBound(node)
+            score = self.getScore(layout)
+            if score > bestScore:
+                bestLayout, bestScore = layout, score
+            if isCloseEnough(bound, bestScore, relativeGap):
+                if bound > bestScore + BOUND_TOLERANCE:
+                    skippedBound = max(skippedBound, bound)
+                continue
+
+            # Explore the most promising letters first (they are pushed last).
+            position = self.order[node.depth]
+            children = [(childBounds[(child, position)], node, child) for child in node.remaining]
+            if node.nrOfEmpty > 0:
+                children.append((childBounds[(FILL_SYMBOL, position)], node, FILL_SYMBOL))
+            children.sort(key=lambda child: child[0])
+            stack.extend(children)
+
+        upperBound = max([bestScore, skippedBound] + [bound for bound, _, _ in stack])
+        return SolverResult(bestLayout, bestScore, upperBound, not stack, nrOfNodes, time() - start)
+
+    def isValidLayout(self, layout: str) -> bool:
+        """Returns whether `layout` contains exactly the letters and has the fixed letters at their positions."""
+        return len(layout) == self.nrOfPositions \
+            and sorted(letter for letter in layout if letter != FILL_SYMBOL) == sorted(self.letters) \
+            and all(layout[position] == letter for position, letter in self.fixedLetters.items())
+
+
+def isCloseEnough(bound: float, bestScore: float, relativeGap: float) -> bool:
+    """Returns whether no layout below a partial layout with this `bound` can be better than `bestScore` by more than `relativeGap`."""
+    return bound - bestScore <= max(BOUND_TOLERANCE, relativeGap*bound)
+
+
+def maximizeAssignment(costs: list) -> tuple:
+    """Solves the (square) linear assignment problem for the highest total with the Hungarian algorithm.
+    Returns (highest total, the column of each row, reduced costs).
+    `reducedCosts[row][column]` is how much the total drops at least if `row` is assigned to `column`."""
+    size = len(costs)
+    infinity = float('inf')
+    # The Hungarian algorithm minimizes, so the costs are negated. (1-indexed, row/column 0 is a helper)
+    u = [0.0]*(size + 1)
+    v = [0.0]*(size + 1)
+    rowOfColumn = [0]*(size + 1)
+    way = [0]*(size + 1)
+    for row in range(1, size + 1):
+        rowOfColumn[0] = row
+        column0 = 0
+        minValues = [infinity]*(size + 1)
+        used = [False]*(size + 1)
+        while True:
+            used[column0] = True
+            row0 = rowOfColumn[column0]
+            rowCosts = costs[row0 - 1]
+            u0 = u[row0]
+            delta = infinity
+            column1 = 0
+            for column in range(1, size + 1):
+                if not used[column]:
+                    current = -rowCosts[column - 1] - u0 - v[column]
+                    if current < minValues[column]:
+                        minValues[column] = current
+                        way[column] = column0
+                    if minValues[column] < delta:
+                        delta = minValues[column]
+                        column1 = column
+            for column in range(size + 1):
+                if used[column]:
+                    u[rowOfColumn[column]] += delta
+                    v[column] -= delta
+                else:
+                    minValues[column] -= delta
+            column0 = column1
+            if rowOfColumn[column0] == 0:
+                break
+        while column0:
+            column1 = way[column0]
+            rowOfColumn[column0] = rowOfColumn[column1]
+            column0 = column1
+
+    assignment = [0]*size
+    for column in range(1, size + 1):
+        assignment[rowOfColumn[column] - 1] = column - 1
+    reducedCosts = [[max(0.0, -costs[row][column] - u[row + 1] - v[column + 1]) for column in range(size)] for row in range(size)]
+    return sum(costs[row][assignment[row]] for row in range(size)), assignment, reducedCosts
@@ -0,0 +1,60 @@
+"""Fingerprints of everything that influences the results of a search.
+Two runs with the same fingerprint find exactly the same layouts, so their results can be reused. (See `checkpoints.py`)"""
+import hashlib
+
+from config import BIGRAMS_CONFIGS, USE_ANNEALING, ANNEALING_TIME_LIMIT, ANNEALING_SEED, ANNEALING_CHAINS, NR_OF_BEST_LAYOUTS, NR_OF_LAYERS, PERFORM_GREEDY_OPTIMIZATION, LETTERS_PER_LAYER, FILL_SYMBOL, SKIP_SYMMETRIC_LAYOUTS, USE_SEPARABLE_SCORING, SCORE_LIST
+import bigram_corpus
+
+
+def getCorpusFingerprints(configs: tuple = BIGRAMS_CONFIGS) -> tuple:
+    """Returns (weight, content-hash) of every bigram-list that is used for the optimization."""
+    return tuple(
+        (config.weight, bigram_corpus.loadCorpus(config.path).sourceHash.hex())
+        for config in configs if config.weight > 0)
+
+
+def getLanguageFingerprints(configs: tuple = BIGRAMS_CONFIGS) -> tuple:
+    """Returns the content-hash of every bigram-list (also of the ones with a weight of 0), in the order of the configs."""
+    return tuple(bigram_corpus.loadCorpus(config.path).sourceHash.hex() for config in configs)
+
+
+def getScoreListFingerprint() -> str:
+    """Returns the hash of the values of `SCORE_LIST`."""
+    scoreHash = hashlib.sha256()
+    for row in SCORE_LIST:
+        scoreHash.update(repr(list(row)).encode('utf-8'))
+    return scoreHash.hexdigest()
+
+
+def getSearchFingerprint(layerLetters: tuple, staticLetters: tuple) -> str:
+    """Returns the hash of all inputs of the search: The letters of the layers, the fixated letters,
+    the search-settings, the contents and weights of the bigram-lists and the score list."""
+    inputs = (
+        tuple(layerLetters),
+        tuple(staticLetters),
+        NR_OF_BEST_LAYOUTS,
+        NR_OF_LAYERS,
+        PERFORM_GREEDY_OPTIMIZATION,
+        LETTERS_PER_LAYER,
+        FILL_SYMBOL,
+        SKIP_SYMMETRIC_LAYOUTS,
+        USE_SEPARABLE_SCORING,
+        (ANNEALING_TIME_LIMIT, ANNEALING_SEED, ANNEALING_CHAINS) if USE_ANNEALING else None,
+        getCorpusFingerprints(),
+        getScoreListFingerprint(),
+    )
+    return hashlib.sha256(repr(inputs).encode('utf-8')).hexdigest()
+
+
+def getCandidateFingerprint() -> str:
+    """Returns the hash of everything the per-language scores of layouts depend on:
+    the size of the layouts, the contents of all bigram-lists (but not their weights) and the score list.
+    Runs which only differ in the weights share their stored layouts. (See `result_cache.addCandidates()`)"""
+    inputs = (
+        NR_OF_LAYERS,
+        LETTERS_PER_LAYER,
+        FILL_SYMBOL,
+        getLanguageFingerprints(),
+        getScoreListFingerprint(),
+    )
+    return hashlib.sha256(repr(inputs).encode('utf-8')).hexdigest()
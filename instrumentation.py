@@ -0,0 +1,171 @@
+"""Records what happens during a run, phase by phase, and writes it as a JSON report.
+
+A phase (a cycle of layers 1 and 2, layer 3, layer 4, a greedy optimization, ...) is started with `beginPhase()` and ended with `endPhase()`.
+Phases can be nested. Everything that is counted while a phase is running (`count()`, `addStage()`) belongs to the innermost one.
+What is counted outside of all phases belongs to the run itself.
+A phase that was cut short (because the deadline was reached, see `deadline.py`) is marked as incomplete, and so are the phases it is part of."""
+import os
+import sys
+from time import perf_counter, process_time, time
+
+
+class Phase:
+    """The measurements of one phase of a run."""
+
+    def __init__(self, name: str, parent: str = None):
+        self.name = name
+        self.parent = parent
+        self.startWallTime = perf_counter()
+        self.startCpuTime = process_time()
+        self.wallSeconds = None
+        self.cpuSeconds = None
+        self.peakMemoryKiB = None
+        self.layoutsGenerated = 0
+        self.layoutsScored = 0
+        # The layouts that weren't tested because the phase was cut short
+        self.layoutsSkipped = 0
+        self.isComplete = True
+        # The number of bigrams (after `filterBigrams()`) of every stage that scored layouts in this phase
+        self.bigramCounts = []
+        # Everything else that was counted. {name: count}
+        self.counters = dict()
+
+    def end(self) -> None:
+        """Stops the phase's clocks."""
+        self.wallSeconds = perf_counter() - self.startWallTime
+        self.cpuSeconds = process_time() - self.startCpuTime
+        self.peakMemoryKiB = getPeakMemory()
+
+    def toDict(self) -> dict:
+        """Returns the measurements in the form they're written to the report."""
+        return {
+            'name': self.name,
+            'parent': self.parent,
+            'wallSeconds': self.wallSeconds,
+            'cpuSeconds': self.cpuSeconds,
+            'layoutsGenerated': self.layoutsGenerated,
+            'layoutsScored': self.layoutsScored,
+            'layoutsSkipped': self.layoutsSkipped,
+            'complete': self.isComplete,
+            'bigramCounts': self.bigramCounts,
+            'peakMemoryKiB': self.peakMemoryKiB,
+            **self.counters,
+        }
+
+
+# All phases of the run in the order they were started, and the ones that are currently running.
+phases = []
+runningPhases = []
+# What was counted outside of all phases. {name: count}
+runCounters = dict()
+runStartTime = time()
+
+
+def beginPhase(name: str) -> Phase:
+    """Starts a new phase inside of the currently running one (if there is one)."""
+    phase = Phase(name, runningPhases[-1].name if runningPhases else None)
+    phases.append(phase)
+    runningPhases.append(phase)
+    return phase
+
+
+def endPhase() -> Phase:
+    """Ends the innermost running phase."""
+    phase = runningPhases.pop()
+    phase.end()
+    return phase
+
+
+def addPhase(phase: Phase) -> None:
+    """Adds a phase that was measured somewhere else (like in a worker process)."""
+    phases.append(phase)
+
+
+def addStage(nrOfLayouts: int, nrOfBigrams: int) -> None:
+    """Records that `nrOfLayouts` layouts were generated and scored with `nrOfBigrams` bigrams."""
+    if runningPhases:
+        phase = runningPhases[-1]
+        phase.layoutsGenerated += nrOfLayouts
+        phase.layoutsScored += nrOfLayouts
+        phase.bigramCounts.append(nrOfBigrams)
+
+
+def skipLayouts(nrOfLayouts: int) -> None:
+    """Records that `nrOfLayouts` of the layouts of the last stage (see `addStage()`) weren't tested after all."""
+    if runningPhases:
+        phase = runningPhases[-1]
+        phase.layoutsGenerated -= nrOfLayouts
+        phase.layoutsScored -= nrOfLayouts
+        phase.layoutsSkipped += nrOfLayouts
+    markIncomplete()
+
+
+def markIncomplete() -> None:
+    """Marks all running phases as cut short."""
+    for phase in runningPhases:
+        phase.isComplete = False
+
+
+def getUnfinishedPhases() -> list:
+    """Returns the names of all phases that were cut short."""
+    return [phase.name for phase in phases if not phase.isComplete]
+
+
+def getCoverage() -> dict:
+    """Returns which phases were finished and which share of the layouts of their stages was tested."""
+    layoutsScored = sum(phase.layoutsScored for phase in phases)
+    layoutsSkipped = sum(phase.layoutsSkipped for phase in phases)
+    return {
+        'finishedPhases': [phase.name for phase in phases if phase.isComplete],
+        'unfinishedPhases': getUnfinishedPhases(),
+        'layoutsScored': layoutsScored,
+        'layoutsSkipped': layoutsSkipped,
+        'testedShare': layoutsScored / (layoutsScored + layoutsSkipped) if layoutsScored + layoutsSkipped else None,
+    }
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Adds `amount` to the counter `name` of the innermost running phase (or of the run, if no phase is running)."""
+    counters = runningPhases[-1].counters if runningPhases else runCounters
+    counters[name] = counters.get(name, 0) + amount
+
+
+def getPeakMemory() -> int:
+    """Returns the peak resident set size of this process in KiB. (`None` where it can't be measured, like on Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def getCacheStats(cache) -> dict:
+    """Returns the hits, misses and evictions of an `LRUCache`."""
+    lookups = cache.hits + cache.misses
+    return {
+        'hits': cache.hits,
+        'misses': cache.misses,
+        'hitRate': cache.hits / lookups if lookups else None,
+        'evictions': cache.evictions,
+        'entries': len(cache),
+        'maxSize': cache.maxSize,
+    }
+
+
+def writeReport(path: str, details: dict) -> None:
+    """Writes all phases (and `details` about the run) as a JSON report to `path`."""
+    import json
+
+    report = {
+        'started': runStartTime,
+        'wallSeconds': time() - runStartTime,
+        'cpuSeconds': process_time(),
+        'peakMemoryKiB': getPeakMemory(),
+        **details,
+        'counters': runCounters,
+        'phases': [phase.toDict() for phase in phases],
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as reportFile:
+        json.dump(report, reportFile, indent=2)
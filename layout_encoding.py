@@ -0,0 +1,189 @@
+"""Compact representations of layouts, so that they don't have to be kept around as Python strings.
+- The permutations of a layer are addressed by their rank (Lehmer code) instead of being stored.
+- Layouts that are kept are stored as packed bytes (one byte per asciified letter).
+In both cases, a layout is only turned into a string when it is accessed."""
+from array import array
+import itertools
+import math
+
+
+def countPermutations(counts: list) -> int:
+    """Returns the number of distinct orderings of a multiset. (`counts` are the multiplicities of its elements)"""
+    nrOrderings = math.factorial(sum(counts))
+    for count in counts:
+        nrOrderings //= math.factorial(count)
+    return nrOrderings
+
+
+class PermutationSpace:
+    """All distinct orderings of `letters` (which may contain repeated letters, like fill-symbols), addressed by their rank.
+    Orderings are sorted lexicographically by the letters' first appearance in `letters`.
+    (If all letters are different, this is the order of `itertools.permutations(letters)`)
+    `staticLetters` (see `FIXATED_LETTERS`) are inserted at their fixed positions and don't move."""
+
+    def __init__(self, letters: str, staticLetters: tuple = ()):
+        self.symbols = ''.join(dict.fromkeys(letters))
+        self.counts = [letters.count(symbol) for symbol in self.symbols]
+        self.letters = letters
+        self.staticLetters = tuple(staticLetters)
+        self.size = countPermutations(self.counts)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            beginning, ending, _ = idx.indices(self.size)
+            return tuple(self.iterate(beginning, ending))
+        if idx < 0:
+            idx += self.size
+        if not 0 <= idx < self.size:
+            raise IndexError('permutation rank out of range')
+        return self.addStaticLetters(''.join(self.symbols[symbolIdx] for symbolIdx in self.unrank(idx)))
+
+    def __iter__(self):
+        return self.iterate(0, self.size)
+
+    def iterate(self, beginning: int, ending: int):
+        """Yields the permutations with the ranks `beginning` to `ending` (exclusive)."""
+        if beginning >= ending:
+            return
+        if beginning == 0 and ending == self.size and len(self.symbols) == len(self.letters):
+            # All letters are different; itertools is much faster.
+            for letters in itertools.permutations(self.letters):
+                yield self.addStaticLetters(''.join(letters))
+            return
+        symbolIndices = self.unrank(beginning)
+        for _ in range(ending - beginning):
+            yield self.addStaticLetters(''.join(self.symbols[symbolIdx] for symbolIdx in symbolIndices))
+            nextPermutation(symbolIndices)
+
+    def unrank(self, rank: int) -> list:
+        """Returns the permutation with the given rank as a list of indices into `self.symbols`."""
+        counts = list(self.counts)
+        symbolIndices = []
+        for _ in range(len(self.letters)):
+            for symbolIdx, count in enumerate(counts):
+                if count == 0:
+                    continue
+                counts[symbolIdx] -= 1
+                nrStartingWithSymbol = countPermutations(counts)
+                if rank < nrStartingWithSymbol:
+                    symbolIndices.append(symbolIdx)
+                    break
+                rank -= nrStartingWithSymbol
+                counts[symbolIdx] += 1
+        return symbolIndices
+
+    def rank(self, permutation: str) -> int:
+        """Returns the rank of a permutation. (Static letters have to be left out)"""
+        counts = list(self.counts)
+        rank = 0
+        for letter in permutation:
+            letterIdx = self.symbols.index(letter)
+            for symbolIdx in range(letterIdx):
+                if counts[symbolIdx]:
+                    counts[symbolIdx] -= 1
+                    rank += countPermutations(counts)
+                    counts[symbolIdx] += 1
+            counts[letterIdx] -= 1
+        return rank
+
+    def addStaticLetters(self, permutation: str) -> str:
+        """Inserts the static letters at their positions."""
+        if not self.staticLetters:
+            return permutation
+        layout = ''
+        j = 0
+        for staticLetter in self.staticLetters:
+            if staticLetter != '':
+                layout += staticLetter
+            else:
+                layout += permutation[j]
+                j += 1
+        return layout
+
+
+class PermutationSubset:
+    """Some of the permutations of a `PermutationSpace`, stored as their ranks."""
+
+    def __init__(self, permutations: PermutationSpace, ranks):
+        self.permutations = permutations
+        self.ranks = array("L", ranks)
+
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return tuple(self.permutations[rank] for rank in self.ranks[idx])
+        return self.permutations[self.ranks[idx]]
+
+    def __iter__(self):
+        for rank in self.ranks:
+            yield self.permutations[rank]
+
+
+def nextPermutation(items: list) -> None:
+    """Turns `items` into the lexicographically next permutation (in place). Also works with repeated items."""
+    i = len(items) - 2
+    while i >= 0 and items[i] >= items[i+1]:
+        i -= 1
+    if i < 0:
+        return
+    j = len(items) - 1
+    while items[j] <= items[i]:
+        j -= 1
+    items[i], items[j] = items[j], items[i]
+    items[i+1:] = reversed(items[i+1:])
+
+
+class LayoutBuffer:
+    """A read-only sequence of layouts which are stored as fixed-width bytes in a buffer.
+    Layouts are only turned into strings when they are accessed."""
+
+    def __init__(self, buffer: memoryview, layoutLength: int):
+        self.buffer = buffer
+        self.layoutLength = layoutLength
+
+    def __len__(self) -> int:
+        return len(self.buffer) // self.layoutLength
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            beginning, ending, _ = idx.indices(len(self))
+            return LayoutBuffer(self.buffer[beginning*self.layoutLength:ending*self.layoutLength], self.layoutLength)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('layout index out of range')
+        return str(self.buffer[idx*self.layoutLength:(idx+1)*self.layoutLength], 'latin-1')
+
+
+class PackedLayouts:
+    """A growable sequence of layouts of the same length, stored as packed bytes (one byte per asciified letter)."""
+
+    def __init__(self, layouts=()):
+        self.data = bytearray()
+        self.layoutLength = 0
+        self.extend(layouts)
+
+    def extend(self, layouts) -> None:
+        """Adds layouts to the end of the sequence."""
+        for layout in layouts:
+            self.layoutLength = len(layout)
+            self.data += layout.encode('latin-1')
+
+    def __len__(self) -> int:
+        return len(self.data) // self.layoutLength if self.layoutLength else 0
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('layout index out of range')
+        return self.data[idx*self.layoutLength:(idx+1)*self.layoutLength].decode('latin-1')
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
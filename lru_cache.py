@@ -0,0 +1,41 @@
+"""A size-bounded cache that counts how well it works."""
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Keeps the `maxSize` most recently used entries. (`maxSize = 0` means no limit)
+    Counts hits, misses and evictions, so it can be checked whether the size fits the workload."""
+
+    def __init__(self, maxSize: int):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value of `key` (and marks it as recently used), or `default` if there is none."""
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value) -> None:
+        """Caches a value. If the cache is full, the least recently used entry is removed."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if self.maxSize and len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def getStats(self) -> str:
+        """Returns a short summary of the cache's hits, misses and evictions."""
+        lookups = self.hits + self.misses
+        hitRate = self.hits / lookups * 100 if lookups else 0.0
+        size = f'{len(self)}/{self.maxSize}' if self.maxSize else f'{len(self)}'
+        return f'{self.hits} hits, {self.misses} misses ({hitRate:.1f}% hit rate), {self.evictions} evictions, {size} entries'
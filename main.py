@@ -2,20 +2,35 @@ from array import array
 import os.path
 import itertools
 from collections import OrderedDict
-from copy import deepcopy
-import math
-import random
-import statistics
-import multiprocessing
+import operator
 from functools import partial
-import platform
+from collections.abc import Iterator
 
-from config import BIGRAMS_CONFIGS, LAYER_1_LETTERS, LAYER_2_LETTERS, LAYER_3_LETTERS, LAYER_4_LETTERS, VAR_LETTERS_L1_L2, MANUALLY_DEFINE_LAYERS, AUTO_LAYER_SWAP_COUNT, AUTO_LAYER_EMPTY_COUNT, AUTO_LAYER_IGNORE, FIXATE_MOST_COMMON_LETTER, FIXATED_LETTERS, NR_OF_LAYERS, NR_OF_BEST_LAYOUTS, PERFORM_GREEDY_OPTIMIZATION, SHOW_DATA, SHOW_GENERAL_STATS, SHOW_TOP_LAYOUTS, TEST_CUSTOM_LAYOUTS, CUSTOM_LAYOUTS, LETTERS_PER_LAYER, DISABLE_UNICODE, DEBUG_MODE, USE_MULTIPROCESSING, FILL_SYMBOL, SCORE_LIST, SCREEN_WIDTH
-from helper_classes import BigramsConfig, ConfigSpecificResults
+from config import BIGRAMS_CONFIGS, LAYER_1_LETTERS, LAYER_2_LETTERS, LAYER_3_LETTERS, LAYER_4_LETTERS, VAR_LETTERS_L1_L2, MANUALLY_DEFINE_LAYERS, AUTO_LAYER_SWAP_COUNT, AUTO_LAYER_EMPTY_COUNT, AUTO_LAYER_IGNORE, FIXATE_MOST_COMMON_LETTER, FIXATED_LETTERS, SKIP_SYMMETRIC_LAYOUTS, NR_OF_LAYERS, NR_OF_BEST_LAYOUTS, PERFORM_GREEDY_OPTIMIZATION, SHOW_DATA, SHOW_GENERAL_STATS, SHOW_TOP_LAYOUTS, TEST_CUSTOM_LAYOUTS, CUSTOM_LAYOUTS, LETTERS_PER_LAYER, DISABLE_UNICODE, DEBUG_MODE, USE_MULTIPROCESSING, MULTIPROCESSING_CHUNK_SIZE, PARALLEL_CYCLES, USE_NUMPY, USE_SEPARABLE_SCORING, BIGRAM_CACHE_SIZE, USE_CHECKPOINTS, USE_RESULT_CACHE, WRITE_RUN_REPORT, RUN_REPORT_FILE, USE_EXACT_SOLVER, EXACT_SOLVER_TIME_LIMIT, EXACT_SOLVER_GAP, USE_ANNEALING, ANNEALING_TIME_LIMIT, ANNEALING_SEED, ANNEALING_CHAINS, DEADLINE, RERANK_STORED_LAYOUTS, RERANK_GREEDY_LAYOUTS, RESULT_CACHE_CANDIDATES, FILL_SYMBOL, SCORE_LIST, SCREEN_WIDTH
+from helper_classes import BigramsConfig
 from ui_helpers import *
+import numpy_scoring
+import instrumentation
+import deadline
+import bigram_corpus
+from delta_scoring import SwapScorer
+# Importing multiprocessing takes longer than everything else at startup, so it's only imported if it's going to be used.
+# (The modules that only some settings need are imported in the functions that use them)
+if USE_MULTIPROCESSING is True:
+    import worker_pool
+    import shared_buffers
+    from shared_buffers import SharedStageData
+from layout_encoding import LayoutBuffer, PermutationSpace, PermutationSubset, PackedLayouts
+from symmetry import getScoreListSymmetries, getLayerSymmetries, isCanonical
+from separable_scoring import CombinationScorer, CombinedLayouts
+from lru_cache import LRUCache
+from selection import TopLayouts, selectTopIndices, mergeTopEntries, entriesToResults
 
 start_time = time()
 
+# The number of layouts each stage (and each chunk of a stage) returns. Never less than `NR_OF_BEST_LAYOUTS`.
+NR_OF_STAGE_RESULTS = max(NR_OF_BEST_LAYOUTS, 500)
+
 
 def main():
     ###########################################################################################################################
@@ -26,6 +41,8 @@ def main():
     ###########################################################################################################################
     ###########################################################################################################################
 
+    deadline.start(DEADLINE)
+
     # Make sure staticLetters and customLayouts are lowercase and properly formatted
     staticLetters = lowerStaticLetters(FIXATED_LETTERS)
     customLayouts = OrderedDict()
@@ -74,12 +91,18 @@ def main():
     Info(f'Variable letters: {layerLetters[4][:half]} {"<->" if DISABLE_UNICODE else "⇄"} {layerLetters[4][half:]}')
     if MANUALLY_DEFINE_LAYERS is False and FIXATE_MOST_COMMON_LETTER:
         Info(f'Fixated: \'{staticLetters[0]}\' on the bottom-right')
-    write('\n\n')
 
-    if DEBUG_MODE:
+    # Find the rotations and mirror images that don't change the scores.
+    if SKIP_SYMMETRIC_LAYOUTS is True:
+        scoreListSymmetries = getScoreListSymmetries(NR_OF_LAYERS*LETTERS_PER_LAYER)
+        staticPositions = tuple(position for position, letter in enumerate(staticLetters) if letter)
+        layerSymmetries = tuple(getLayerSymmetries(scoreListSymmetries, layerNr, staticPositions) for layerNr in range(4))
         write('\n')
-    displayTitle('Optimization')
-    displaySubtitle('Cycles for variable letters (Layers 1 and 2)')
+        Info(f'Symmetries of the score list: {len(scoreListSymmetries)},  '
+             f'skipped per layer: {", ".join(str(len(symmetries)) for symmetries in layerSymmetries[:NR_OF_LAYERS])}')
+    else:
+        layerSymmetries = ((), (), (), ())
+    write('\n\n')
 
     # Asciify the layer letters
     layer1letters = asciify(layerLetters[0])
@@ -90,73 +113,203 @@ def main():
 
     staticLetters = tuple(asciify(l) for l in staticLetters)
 
+    import fingerprints
+    import checkpoints
+    import result_cache
+
+    # The fingerprint of everything that influences the results. (See `fingerprints.py`)
+    runFingerprint = None
+    if USE_CHECKPOINTS is True or USE_RESULT_CACHE is True:
+        runFingerprint = fingerprints.getSearchFingerprint(layerLetters, staticLetters)
+    # The fingerprint of what the per-language scores of the layouts depend on. (The stored layouts can be re-ranked with other weights)
+    candidateFingerprint = None
+    if RESULT_CACHE_CANDIDATES > 0:
+        candidateFingerprint = fingerprints.getCandidateFingerprint()
+
+    # Reuse the results of an earlier run with the same inputs, if there is one.
+    # The results of the simulated annealing depend on how fast the computer is, so they are neither reused nor stored.
+    useResultCache = USE_RESULT_CACHE is True and USE_ANNEALING is not True
+    cachedResults = result_cache.loadResults(runFingerprint) if useResultCache else None
+    storedCandidates = None
+    if cachedResults is None and RERANK_STORED_LAYOUTS is True:
+        storedCandidates = loadStoredCandidates(candidateFingerprint, staticLetters)
+        if storedCandidates is None:
+            Info('There are no stored layouts for these bigram-lists and fixated letters yet, optimizing instead.')
+            write('\n\n')
+    if cachedResults is not None:
+        finalLayoutList, finalScoresList = cachedResults
+        Info('Found the results of an earlier run with the same settings, skipping the optimization.')
+        write('\n\n')
+    elif storedCandidates is not None:
+        finalLayoutList, finalScoresList = rerankLayouts(storedCandidates)
+        if RESULT_CACHE_CANDIDATES > 0:
+            # Only the layouts the greedy optimization found are new, the others are stored already.
+            storeCandidates(candidateFingerprint, [layout for layout in finalLayoutList if layout not in storedCandidates])
+    else:
+        if USE_ANNEALING is True:
+            finalLayoutList, finalScoresList = annealLayouts(
+                (layer1letters, layer2letters, layer3letters, layer4letters), staticLetters)
+        else:
+            finalLayoutList, finalScoresList = optimizeLayouts(
+                (layer1letters, layer2letters, layer3letters, layer4letters), varLetters_L1_L2, staticLetters, layerSymmetries, runFingerprint)
+        # Results of a run that was cut short by the deadline aren't the ones a full run would find.
+        if useResultCache and not isCutShort():
+            result_cache.saveResults(runFingerprint, finalLayoutList, finalScoresList)
+        if RESULT_CACHE_CANDIDATES > 0:
+            storeCandidates(candidateFingerprint, finalLayoutList)
+
+    isOptimizationCutShort = isCutShort()
+
+    if USE_EXACT_SOLVER is True:
+        # Find out how far the best layout is from the best possible one.
+        finalLayoutList, finalScoresList = exactOptimization(finalLayoutList, finalScoresList, staticLetters)
+
+    displaySubtitle('Finished optimization')
+    if isCutShort():
+        unfinishedPhases = instrumentation.getUnfinishedPhases()
+        Info('The deadline was reached. Showing the best layouts found until then.')
+        write('\n')
+        if 'skippedCycles' in instrumentation.runCounters:
+            Info(f'Skipped cycles: {instrumentation.runCounters["skippedCycles"]}')
+            write('\n')
+        if unfinishedPhases:
+            Info(f'Cut short: {", ".join(unfinishedPhases)}')
+            write('\n')
+        write('\n')
+
+    if SHOW_DATA is True:
+        if TEST_CUSTOM_LAYOUTS is True:
+            for name, layout in customLayouts.items():
+                # If you're only testing a certain number of layers, only use that amount of layers in the name of the custom layouts.
+                if len(layout) > (NR_OF_LAYERS*LETTERS_PER_LAYER):
+                    customLayouts[name] = layout[:NR_OF_LAYERS *
+                                                 LETTERS_PER_LAYER]
+
+        # Display the data in the terminal.
+        showDataInTerminal(finalLayoutList, finalScoresList, customLayouts)
+
+    write('\n')
+    Info(f'Bigram cache: {bigramCache.getStats()}')
+    write('\n\n')
+
+    if WRITE_RUN_REPORT is True:
+        instrumentation.writeReport(RUN_REPORT_FILE, {
+            'fingerprint': runFingerprint,
+            'resultCacheHit': cachedResults is not None,
+            'caches': {'bigrams': instrumentation.getCacheStats(bigramCache)},
+            'deadline': {'seconds': DEADLINE or None, 'reached': isCutShort(), **instrumentation.getCoverage()},
+        })
+        Info(f'Run report: {RUN_REPORT_FILE}')
+        write('\n\n')
+
+    # The run is finished, so there is nothing left to resume. (Unless it was cut short, then the finished cycles can be resumed)
+    if USE_CHECKPOINTS is True and not isOptimizationCutShort:
+        checkpoints.removeCheckpoint()
+
+
+def optimizeLayouts(layerLetters: tuple, varLetters_L1_L2: str, staticLetters: tuple, layerSymmetries: tuple, runFingerprint: str) -> tuple:
+    """Runs the optimization (the cycles of layers 1 and 2, then layers 3 and 4) and returns the best layouts and their scores.
+    All letters have to be asciified already."""
+    import checkpoints
+
+    layer1letters, layer2letters, layer3letters, layer4letters = layerLetters
+
+    if DEBUG_MODE:
+        write('\n')
+    displayTitle('Optimization')
+    displaySubtitle('Cycles for variable letters (Layers 1 and 2)')
+
     # Get the letters for the layers possible with the letters you specified.
     firstLayers, secondLayers = getLayerCombinations(
         layer1letters, layer2letters, varLetters_L1_L2)
     #secondLayers, thirdLayers = getLayers(layer2letters, layer3letters, varLetters_L2_L3)
     nrOfCycles = len(firstLayers)
 
-    # Prepare variables for later.
-    tempLayoutList = []
+    # The permutations of layers 3 and 4 are the same in every cycle.
+    _, _, layouts_L3, layouts_L4 = getLayerPermutations(
+        getVariableLetters(firstLayers[0], staticLetters), staticLetters, secondLayers[0], layer3letters, layer4letters, layerSymmetries)
+
+    # Prepare variables for later. (The kept layouts of all cycles are stored as packed bytes)
+    tempLayoutList = PackedLayouts()
     tempScoresList = []
 
     finalLayoutList = []
     finalScoresList = []
 
+    # Resume an interrupted run with the same settings, if there is one.
+    checkpoint = dict()
+    if USE_CHECKPOINTS is True:
+        checkpoint = checkpoints.loadCheckpoint(runFingerprint) or dict()
+        if checkpoint:
+            tempLayoutList, tempScoresList = checkpoint['tempLayouts'], checkpoint['tempScores']
+            Info(f'Resuming from checkpoint ({checkpoint["nrOfCycles"]}/{nrOfCycles} cycles done)')
+            instrumentation.count('resumedCycles', checkpoint['nrOfCycles'])
+            write('\n')
+    finishedCycles = checkpoint.get('nrOfCycles', 0)
+
     if not DEBUG_MODE:
         # Create the cycles progress bar
         cyclesProgress = Progress(nrOfCycles)
+        cyclesProgress.set_prog(finishedCycles)
+
+    # The arguments of `runCycle()` for every cycle that still has to be done
+    cycles = tuple(
+        (cycleNr, firstLayers[cycleNr], secondLayers[cycleNr], staticLetters, layer3letters, layer4letters, layerSymmetries)
+        for cycleNr in range(finishedCycles, nrOfCycles))
+
+    # Only cycles that (like all cycles before them) weren't cut short by the deadline are saved in the checkpoint.
+    isCheckpointComplete = True
+    if USE_MULTIPROCESSING is True and PARALLEL_CYCLES is True and len(cycles) > 1:
+        # Every worker process does whole cycles. They finish in any order,
+        # but their results are added in the order of the cycles, so the results are the same as without multiprocessing.
+        finishedResults = dict()
+        for cycleNr, cycleResults, phase in worker_pool.getPool().imap_unordered(
+                partial(runCycle_multiprocessing, dict(replacedWithAscii), deadline.getEndTime()), cycles):
+            finishedResults[cycleNr] = cycleResults
+            if phase is not None:
+                instrumentation.addPhase(phase)
+            if not DEBUG_MODE:
+                cyclesProgress.set_status(f'Finished cycle: {cycleNr + 1}')
+                cyclesProgress.set_prog(finishedCycles + len(finishedResults))
+
+            while finishedCycles in finishedResults:
+                cycleResults = finishedResults.pop(finishedCycles)
+                finishedCycles += 1
+                if cycleResults is None:
+                    # The cycle was skipped because the deadline was reached.
+                    instrumentation.count('skippedCycles')
+                    isCheckpointComplete = False
+                    continue
+                goodLayouts, goodScores, isComplete = cycleResults
+                tempLayoutList.extend(goodLayouts)
+                tempScoresList.extend(goodScores)
+                isCheckpointComplete = isCheckpointComplete and isComplete
+                if USE_CHECKPOINTS is True and isCheckpointComplete:
+                    checkpoint = dict(nrOfCycles=finishedCycles, tempLayouts=tempLayoutList, tempScores=tempScoresList)
+                    checkpoints.saveCheckpoint(runFingerprint, checkpoint)
+    else:
+        # Start the actual testing process
+        for cycle in cycles:
+            cycleNr = cycle[0]
+            if cycleNr > 0 and deadline.isReached():
+                instrumentation.count('skippedCycles', nrOfCycles - cycleNr)
+                break
+            if DEBUG_MODE:
+                print(f'\nCycle {cycleNr + 1} of {nrOfCycles}')
+            else:
+                cyclesProgress.set_status(f'Current cycle: {cycleNr + 1}')
+                cyclesProgress.set_prog(cycleNr)
 
-    # Start the actual testing process
-    for cycleNr, letters_L1 in enumerate(firstLayers):
-        letters_L2 = secondLayers[cycleNr]
-        ####################################################################################################################
-        # Calculate the first Layer
-
-        if DEBUG_MODE:
-            print(f'\nCycle {cycleNr + 1} of {nrOfCycles}')
-        else:
-            cyclesProgress.set_status(f'Current cycle: {cycleNr + 1}')
-            cyclesProgress.set_prog(cycleNr)
-
-        # get the letters in layer 1 that can actually move.
-        varLetters = getVariableLetters(letters_L1, staticLetters)
-
-        # Get all layouts for each Layer with the current layer-letters.
-        layouts_L1, layouts_L2, layouts_L3, layouts_L4 = getLayerPermutations(
-            varLetters, staticLetters, letters_L2, layer3letters, layer4letters)
-
-        # Test the layer 1 - layouts
-        goodLayouts_L1, goodScores_L1 = testLayouts(layouts_L1)
-        del layouts_L1
-
-        # If the user says so, calculate the second layer.
-        if NR_OF_LAYERS >= 2:
-            ####################################################################################################################
-            # Calculate the second Layer
-            # Sort the best layer-1 layouts and only return the best ones
-            bestLayouts_L1, bestScores_L1 = getTopScores(
-                goodLayouts_L1, goodScores_L1)
-            del goodLayouts_L1, goodScores_L1
-
-            # Combine the layouts of layer 1 and layer 2 to all possible variants
-            layouts_L1_L2 = combinePermutations(bestLayouts_L1, layouts_L2)
-            del bestLayouts_L1, layouts_L2
-
-            # Test the combined layouts of layer 1 and layer2
-            goodLayouts_L1_L2, goodScores_L1_L2 = testLayouts(
-                layouts_L1_L2, bestScores_L1)
-            del layouts_L1_L2, bestScores_L1
-
-            # Add the found layouts to the list (which will later be displayed)
-            tempLayoutList.extend(goodLayouts_L1_L2)
-            tempScoresList.extend(goodScores_L1_L2)
-            del goodLayouts_L1_L2, goodScores_L1_L2
-        else:
             # Add the found layouts to the list (which will later be displayed)
-            tempLayoutList.extend(goodLayouts_L1)
-            tempScoresList.extend(goodScores_L1)
-            del goodLayouts_L1, goodScores_L1
+            goodLayouts, goodScores, isComplete = runCycle(*cycle)
+            tempLayoutList.extend(goodLayouts)
+            tempScoresList.extend(goodScores)
+            del goodLayouts, goodScores
+
+            isCheckpointComplete = isCheckpointComplete and isComplete
+            if USE_CHECKPOINTS is True and isCheckpointComplete:
+                checkpoint = dict(nrOfCycles=cycleNr + 1, tempLayouts=tempLayoutList, tempScores=tempScoresList)
+                checkpoints.saveCheckpoint(runFingerprint, checkpoint)
 
     # Cycles completed
     if not DEBUG_MODE:
@@ -179,27 +332,35 @@ def main():
 
         nrOfBestPermutations = NR_OF_BEST_LAYOUTS * 2
 
-        # Sort the best layer-1 layouts and only return the best ones
-        bestLayouts_L1_L2, bestScores_L1_L2 = getTopScores(
-            tuple(tempLayoutList), tempScoresList)
-        del tempLayoutList, tempScoresList
+        layer3phase = instrumentation.beginPhase('Layer 3')
+        if 'layer3' in checkpoint:
+            goodLayouts_L1_L2_L3, goodScores_L1_L2_L3 = checkpoint['layer3']
+            instrumentation.count('restoredFromCheckpoint')
+            del tempLayoutList, tempScoresList
+        else:
+            # Sort the best layer-1 layouts and only return the best ones
+            bestLayouts_L1_L2, bestScores_L1_L2 = getTopScores(
+                tempLayoutList, tempScoresList)
+            del tempLayoutList, tempScoresList
 
-        # Combine the layouts of layer 1 and layer 2 to all possible variants
-        layouts_L1_L2_L3 = combinePermutations(bestLayouts_L1_L2, layouts_L3)
-        bestLayouts_L1_L2, layouts_L3
+            # Test all combinations of the layouts of layers 1&2 and layer 3
+            initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3 = testCombinedLayouts(
+                bestLayouts_L1_L2, bestScores_L1_L2, layouts_L3)
+            del bestLayouts_L1_L2, bestScores_L1_L2, layouts_L3
 
-        # Test the combined layouts of layers 1&2 and layer 3
-        initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3 = testLayouts(
-            layouts_L1_L2_L3, bestScores_L1_L2)
-        del layouts_L1_L2_L3, bestScores_L1_L2
+            if PERFORM_GREEDY_OPTIMIZATION:
+                # Do an additional hillclimbing-optimization
+                goodLayouts_L1_L2_L3, goodScores_L1_L2_L3 = greedyOptimization(
+                    initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3, l3info)
+            else:
+                goodLayouts_L1_L2_L3, goodScores_L1_L2_L3 = initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3
+            del initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3
 
-        if PERFORM_GREEDY_OPTIMIZATION:
-            # Do an additional hillclimbing-optimization
-            goodLayouts_L1_L2_L3, goodScores_L1_L2_L3 = greedyOptimization(
-                initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3, l3info)
-        else:
-            goodLayouts_L1_L2_L3, goodScores_L1_L2_L3 = initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3
-        del initialGoodLayouts_L1_L2_L3, initialGoodScores_L1_L2_L3
+            if USE_CHECKPOINTS is True and isCheckpointComplete and layer3phase.isComplete:
+                checkpoint = dict(nrOfCycles=nrOfCycles, tempLayouts=None, tempScores=None,
+                                  layer3=(goodLayouts_L1_L2_L3, goodScores_L1_L2_L3))
+                checkpoints.saveCheckpoint(runFingerprint, checkpoint)
+        instrumentation.endPhase()
 
         if not DEBUG_MODE:
             l3info.set_done()
@@ -217,29 +378,35 @@ def main():
 
             nrOfBestPermutations = nrOfBestPermutations * 5
 
-            # Sort the best layer-1 layouts and only return the best ones
-            bestLayouts_L1_L2_L3, bestScores_L1_L2_L3 = getTopScores(
-                goodLayouts_L1_L2_L3, goodScores_L1_L2_L3)
-            del goodLayouts_L1_L2_L3, goodScores_L1_L2_L3
-
-            # Combine the layouts of layer 1 and layer 2 to all possible variants
-            layouts_L1_L2_L3_L4 = combinePermutations(
-                bestLayouts_L1_L2_L3, layouts_L4)
-            del bestLayouts_L1_L2_L3, layouts_L4
-
-            # Test the combined layouts of layers 1&2 and layer 3
-            goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4 = testLayouts(
-                layouts_L1_L2_L3_L4, bestScores_L1_L2_L3)
-            del layouts_L1_L2_L3_L4, bestScores_L1_L2_L3
-
-            if PERFORM_GREEDY_OPTIMIZATION:
-                # Do an additional hillclimbing-optimization, then
-                # add the found layouts to the list (which will later be displayed)
-                finalLayoutList, finalScoresList = greedyOptimization(
-                    goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4, l4info)
+            layer4phase = instrumentation.beginPhase('Layer 4')
+            if 'layer4' in checkpoint:
+                finalLayoutList, finalScoresList = checkpoint['layer4']
+                instrumentation.count('restoredFromCheckpoint')
+                del goodLayouts_L1_L2_L3, goodScores_L1_L2_L3, layouts_L4
             else:
-                finalLayoutList, finalScoresList = goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4
-            del goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4
+                # Sort the best layer-1 layouts and only return the best ones
+                bestLayouts_L1_L2_L3, bestScores_L1_L2_L3 = getTopScores(
+                    goodLayouts_L1_L2_L3, goodScores_L1_L2_L3)
+                del goodLayouts_L1_L2_L3, goodScores_L1_L2_L3
+
+                # Test all combinations of the layouts of layers 1-3 and layer 4
+                goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4 = testCombinedLayouts(
+                    bestLayouts_L1_L2_L3, bestScores_L1_L2_L3, layouts_L4)
+                del bestLayouts_L1_L2_L3, bestScores_L1_L2_L3, layouts_L4
+
+                if PERFORM_GREEDY_OPTIMIZATION:
+                    # Do an additional hillclimbing-optimization, then
+                    # add the found layouts to the list (which will later be displayed)
+                    finalLayoutList, finalScoresList = greedyOptimization(
+                        goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4, l4info)
+                else:
+                    finalLayoutList, finalScoresList = goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4
+                del goodLayouts_L1_L2_L3_L4, goodScores_L1_L2_L3_L4
+
+                if USE_CHECKPOINTS is True and 'layer3' in checkpoint and layer4phase.isComplete:
+                    checkpoint = dict(checkpoint, layer4=(finalLayoutList, finalScoresList))
+                    checkpoints.saveCheckpoint(runFingerprint, checkpoint)
+            instrumentation.endPhase()
 
             if not DEBUG_MODE:
                 l4info.set_done()
@@ -257,18 +424,203 @@ def main():
         finalScoresList = tempScoresList
         del tempLayoutList, tempScoresList
 
-    displaySubtitle('Finished optimization')
+    return finalLayoutList, finalScoresList
 
-    if SHOW_DATA is True:
-        if TEST_CUSTOM_LAYOUTS is True:
-            for name, layout in customLayouts.items():
-                # If you're only testing a certain number of layers, only use that amount of layers in the name of the custom layouts.
-                if len(layout) > (NR_OF_LAYERS*LETTERS_PER_LAYER):
-                    customLayouts[name] = layout[:NR_OF_LAYERS *
-                                                 LETTERS_PER_LAYER]
 
-        # Display the data in the terminal.
-        showDataInTerminal(finalLayoutList, finalScoresList, customLayouts)
+def annealLayouts(layerLetters: tuple, staticLetters: tuple) -> tuple:
+    """Searches full layouts with simulated annealing (see `annealing.py`) and returns the best ones and their scores.
+    All letters have to be asciified already."""
+
+    displayTitle('Optimization')
+    displaySubtitle('Simulated annealing')
+
+    # All letters of the layout. Layers that aren't full are filled up with the fill-symbol.
+    letters = ''.join(layer.ljust(LETTERS_PER_LAYER, FILL_SYMBOL) for layer in layerLetters[:NR_OF_LAYERS])
+    fixedLetters = {position: letter for position, letter in enumerate(staticLetters) if letter}
+
+    nrOfProcesses = worker_pool.getNrOfProcesses() if USE_MULTIPROCESSING is True else 1
+    nrOfChains = ANNEALING_CHAINS or nrOfProcesses
+    # The chains that run at the same time share the time limit. (Which is shorter if the deadline comes first)
+    timeLimit = ANNEALING_TIME_LIMIT
+    remainingTime = deadline.getRemainingTime()
+    if remainingTime is not None and remainingTime < timeLimit:
+        timeLimit = remainingTime
+    chainTimeLimit = timeLimit * min(nrOfChains, nrOfProcesses) / nrOfChains
+    chains = tuple((letters, fixedLetters, chainTimeLimit, f'{ANNEALING_SEED}:{chainNr}') for chainNr in range(nrOfChains))
+
+    if DEBUG_MODE:
+        print(f'DEBUG: {nrOfChains} chains, {chainTimeLimit:.1f}s each')
+        info = None
+    else:
+        info = InfoWithTime('Simulated annealing')
+        info.set_status(f'{nrOfChains} chains')
+    phase = instrumentation.beginPhase('Simulated annealing')
+    if timeLimit < ANNEALING_TIME_LIMIT:
+        instrumentation.markIncomplete()
+
+    if USE_MULTIPROCESSING is True and nrOfChains > 1:
+        chainResults = worker_pool.getPool().imap(partial(runChain_multiprocessing, dict(replacedWithAscii)), chains)
+    else:
+        chainResults = (runChain(*chain) for chain in chains)
+
+    # Merge the best layouts of all chains. Their scores are calculated from scratch, so they are exactly the ones of `testSingleLayout()`.
+    bigrams = getBigrams(''.join(sorted(letters)))
+    asciiArray = getAsciiArray()
+    annealedLayouts = dict()
+    for entries, stats in chainResults:
+        for _, layout in entries:
+            if layout not in annealedLayouts:
+                annealedLayouts[layout] = testSingleLayout(layout, asciiArray, bigrams)
+        for name, amount in stats.items():
+            instrumentation.count(name, amount)
+    phase.layoutsScored = phase.counters.get('swaps', 0)
+    phase.layoutsGenerated = len(annealedLayouts)
+    phase.bigramCounts.append(len(bigrams))
+    instrumentation.endPhase()
+
+    if not DEBUG_MODE:
+        info.set_done()
+        write('\n')
+    write('\n')
+
+    return getTopScores(tuple(annealedLayouts), array("d", annealedLayouts.values()), NR_OF_BEST_LAYOUTS)
+
+
+def runChain(letters: str, fixedLetters: dict, timeLimit: float, seed: str) -> tuple:
+    """Runs one chain of the simulated annealing. (See `annealing.runChain()`)"""
+    import annealing
+    bigrams = getBigrams(''.join(sorted(letters)))
+    return annealing.runChain(letters, fixedLetters, bigrams, timeLimit, seed, NR_OF_BEST_LAYOUTS)
+
+
+def runChain_multiprocessing(replacements: dict, chain: tuple) -> tuple:
+    """Runs one chain of the simulated annealing in a worker process."""
+    # Worker processes that weren't forked don't know which ascii-chars replace which letters.
+    replacedWithAscii.update(replacements)
+    return runChain(*chain)
+
+
+def loadStoredCandidates(candidateFingerprint: str, staticLetters: tuple) -> dict:
+    """Returns the stored layouts of earlier runs (asciified) which have the fixated letters in the right places,
+    and their score vectors. (`None` if there are none)
+    Their letters can differ from the current ones, since the weights decide which letters are the most common ones."""
+    import result_cache
+    fixedLetters = {position: deAsciify(letter) for position, letter in enumerate(staticLetters) if letter}
+    candidates = result_cache.loadCandidates(candidateFingerprint) or dict()
+    candidates = {
+        asciify(layout): scoreVector for layout, scoreVector in candidates.items()
+        if all(layout[position] == letter for position, letter in fixedLetters.items())}
+    return candidates or None
+
+
+def rerankLayouts(candidates: dict) -> tuple:
+    """Ranks the stored layouts of earlier runs (see `loadStoredCandidates()`) by the current weights and returns them and their scores.
+    The best `RERANK_GREEDY_LAYOUTS` of them are improved with the greedy optimization afterwards."""
+
+    displayTitle('Optimization')
+    displaySubtitle('Re-ranking stored layouts')
+
+    # The combined score of a layout is the weighted sum of its scores in each language, so nothing has to be scored again.
+    phase = instrumentation.beginPhase('Re-ranking')
+    weights = getLanguageWeights()
+    layouts = tuple(candidates)
+    scores = array("d", (getCombinedScore(scoreVector, weights) for scoreVector in candidates.values()))
+    layouts, scores = getTopScores(layouts, scores, len(layouts))
+    phase.layoutsScored = len(layouts)
+    instrumentation.endPhase()
+    Info(f'Re-ranked {len(layouts)} stored layouts')
+    write('\n')
+
+    if RERANK_GREEDY_LAYOUTS > 0:
+        if DEBUG_MODE:
+            print('Greedy optimization')
+            info = None
+        else:
+            info = InfoWithTime('Greedy optimization')
+        # Layouts with different letters can't be optimized together. The layouts it finds are scored with the bigrams of the current weights.
+        rankedLayouts = dict(zip(layouts, scores))
+        letterGroups = dict()
+        for layout in layouts[-RERANK_GREEDY_LAYOUTS:]:
+            letterGroups.setdefault(''.join(sorted(layout)), []).append(layout)
+        for groupLayouts in letterGroups.values():
+            optimizedLayouts, optimizedScores = greedyOptimization(
+                tuple(groupLayouts), array("d", (rankedLayouts[layout] for layout in groupLayouts)), info)
+            for layout, score in zip(optimizedLayouts, optimizedScores):
+                rankedLayouts.setdefault(layout, score)
+        layouts, scores = tuple(rankedLayouts), array("d", rankedLayouts.values())
+        if not DEBUG_MODE:
+            info.set_done()
+            write('\n')
+    write('\n')
+
+    return layouts, scores
+
+
+def storeCandidates(candidateFingerprint: str, layouts) -> None:
+    """Stores the layouts with their score in each language, so they can be re-ranked with other weights later. (See `rerankLayouts()`)"""
+    import result_cache
+    layouts = tuple(layouts)
+    if not layouts:
+        return
+    result_cache.addCandidates(candidateFingerprint, (deAsciify(layout) for layout in layouts), getLanguageScores(layouts))
+
+
+def isCutShort() -> bool:
+    """Returns whether the deadline made the run skip or cut short any part of the optimization."""
+    return 'skippedCycles' in instrumentation.runCounters or bool(instrumentation.getUnfinishedPhases())
+
+
+def runCycle(cycleNr: int, letters_L1: str, letters_L2: str, staticLetters: tuple, layer3letters: str, layer4letters: str,
+             layerSymmetries: tuple) -> tuple:
+    """Tests all layouts of layers 1 and 2 of one cycle and returns the best ones, their scores
+    and whether all layouts were tested. (The deadline may cut a cycle short)"""
+    phase = instrumentation.beginPhase(f'Cycle {cycleNr + 1}')
+    ####################################################################################################################
+    # Calculate the first Layer
+
+    # get the letters in layer 1 that can actually move.
+    varLetters = getVariableLetters(letters_L1, staticLetters)
+
+    # Get all layouts for each Layer with the current layer-letters.
+    layouts_L1, layouts_L2, _, _ = getLayerPermutations(
+        varLetters, staticLetters, letters_L2, layer3letters, layer4letters, layerSymmetries)
+
+    # Test the layer 1 - layouts
+    goodLayouts_L1, goodScores_L1 = testLayouts(layouts_L1)
+    del layouts_L1
+
+    # If the user says so, calculate the second layer.
+    if NR_OF_LAYERS >= 2:
+        ####################################################################################################################
+        # Calculate the second Layer
+        # Sort the best layer-1 layouts and only return the best ones
+        bestLayouts_L1, bestScores_L1 = getTopScores(
+            goodLayouts_L1, goodScores_L1)
+        del goodLayouts_L1, goodScores_L1
+
+        # Test all combinations of the layouts of layer 1 and layer 2
+        goodLayouts, goodScores = testCombinedLayouts(
+            bestLayouts_L1, bestScores_L1, layouts_L2)
+        del bestLayouts_L1, bestScores_L1, layouts_L2
+    else:
+        goodLayouts, goodScores = goodLayouts_L1, goodScores_L1
+
+    instrumentation.endPhase()
+    return goodLayouts, goodScores, phase.isComplete
+
+
+def runCycle_multiprocessing(replacements: dict, endTime: float, cycle: tuple) -> tuple:
+    """Does one cycle (see `runCycle()`) in a worker process.
+    Returns the cycle's number, the results of `runCycle()` and the measurements of the cycle. (See `instrumentation.py`)
+    If the deadline (`endTime`) was reached, the cycle is skipped and there are no results. (Except for the first cycle)"""
+    # Worker processes that weren't forked don't know which ascii-chars replace which letters, or when the deadline is.
+    replacedWithAscii.update(replacements)
+    deadline.setEndTime(endTime)
+    cycleNr = cycle[0]
+    if cycleNr > 0 and deadline.isReached():
+        return cycleNr, None, None
+    cycleResults = runCycle(*cycle)
+    return cycleNr, cycleResults, instrumentation.phases.pop()
 
 
 def getLayerLetters() -> tuple:
@@ -329,6 +681,33 @@ def validateSettings(staticLetters) -> bool:
                 print(
                     '"', char, '" was defined in staticLetters, but is not part of the first layer')
                 return False
+    if EXACT_SOLVER_TIME_LIMIT < 0:
+        print("EXACT_SOLVER_TIME_LIMIT can't be negative.")
+        return False
+    if not 0 <= EXACT_SOLVER_GAP < 100:
+        print("EXACT_SOLVER_GAP must be at least 0 and less than 100 (%).")
+        return False
+    if RERANK_GREEDY_LAYOUTS < 0:
+        print("RERANK_GREEDY_LAYOUTS can't be negative.")
+        return False
+    if RESULT_CACHE_CANDIDATES < 0:
+        print("RESULT_CACHE_CANDIDATES can't be negative.")
+        return False
+    if RERANK_STORED_LAYOUTS is True and RESULT_CACHE_CANDIDATES == 0:
+        print("RERANK_STORED_LAYOUTS re-ranks the layouts that earlier runs stored, so RESULT_CACHE_CANDIDATES has to be more than 0.")
+        return False
+    if DEADLINE < 0:
+        print("DEADLINE can't be negative.")
+        return False
+    if USE_ANNEALING and ANNEALING_TIME_LIMIT <= 0:
+        print("ANNEALING_TIME_LIMIT has to be more than 0 seconds.")
+        return False
+    if ANNEALING_CHAINS < 0:
+        print("ANNEALING_CHAINS can't be negative.")
+        return False
+    if USE_NUMPY and not numpy_scoring.isAvailable():
+        print("USE_NUMPY is enabled, but NumPy could not be imported. Install it or disable USE_NUMPY.")
+        return False
     # Check if bigram-settings are valid
     if len(BIGRAMS_CONFIGS) == 0:
         print("No bigrams-config found.")
@@ -353,8 +732,20 @@ def normalizeDict(dictionary: dict) -> dict:
     return {key: dictionary[key]/total for key in dictionary}
 
 
+# {((path, weight) of each config): monograms}
+monogramCache = dict()
+
+
 def generateMonogramsFromBigramFiles(configs: tuple = BIGRAMS_CONFIGS) -> dict:
-    """Uses the bigram-files to generate and return a monogram dictionary"""
+    """Uses the bigram-files to generate and return a monogram dictionary. Each set of configs is only read once."""
+    cacheKey = tuple((config.path, config.weight) for config in configs)
+    if cacheKey not in monogramCache:
+        monogramCache[cacheKey] = readMonograms(configs)
+    return monogramCache[cacheKey]
+
+
+def readMonograms(configs: tuple) -> dict:
+    """Reads the bigram-files and sums up the frequencies of each char (weighted by the configs' weights)."""
 
     # Generate monogram dicts for each language
     # Store them with their weights
@@ -362,8 +753,7 @@ def generateMonogramsFromBigramFiles(configs: tuple = BIGRAMS_CONFIGS) -> dict:
     for config in configs:
         if config.weight <= 0:
             continue
-        with open(config.path, 'r', encoding='utf-8') as corpus:
-            bigrams = {line[:2].lower(): float(line[3:]) for line in corpus}
+        bigrams = dict(bigram_corpus.loadCorpus(config.path).itemsOfLastLines())
         monograms = dict()
         for bigram in bigrams:
             for char in bigram:
@@ -392,9 +782,18 @@ def generateMonogramsFromBigramFiles(configs: tuple = BIGRAMS_CONFIGS) -> dict:
 
 # Used in combination with the `asciify` and `deAsciify` functions
 replacedWithAscii = dict()
-monograms = generateMonogramsFromBigramFiles()
-mostFreqLetters = sorted(monograms, key=lambda i: monograms[i], reverse=True)[:256-LETTERS_PER_LAYER*NR_OF_LAYERS]
-asciiReplacementChars = [chr(i) for i in range(256) if chr(i) not in mostFreqLetters and chr(i) != FILL_SYMBOL]
+# Holds the ascii-chars that are still free to be used as replacements. (Use `getAsciiReplacementChars()` to access them)
+asciiReplacementCharsHolder = []
+
+
+def getAsciiReplacementChars() -> list:
+    """Returns the ascii-chars that are still free to be used as replacements for non-ascii-chars.
+    They are only computed when the first char gets replaced, since this requires reading the bigram-files."""
+    if not asciiReplacementCharsHolder:
+        monograms = generateMonogramsFromBigramFiles()
+        mostFreqLetters = sorted(monograms, key=lambda i: monograms[i], reverse=True)[:256-LETTERS_PER_LAYER*NR_OF_LAYERS]
+        asciiReplacementCharsHolder.append([chr(i) for i in range(256) if chr(i) not in mostFreqLetters and chr(i) != FILL_SYMBOL])
+    return asciiReplacementCharsHolder[0]
 
 
 def asciify(string: str) -> str:
@@ -407,8 +806,7 @@ def asciify(string: str) -> str:
             if char in replacedWithAscii:
                 result[idx] = replacedWithAscii[char]
             else:
-                replacedWithAscii[char] = asciiReplacementChars[-1]
-                asciiReplacementChars.pop()
+                replacedWithAscii[char] = getAsciiReplacementChars().pop()
                 result[idx] = replacedWithAscii[char]
     return ''.join(result)
 
@@ -487,68 +885,23 @@ def getVariableLetters(fullLayer: str, staticLetters: tuple) -> str:
     return varLetters
 
 
-bigramCache = dict()
+# {(sorted letters, ((path, weight) of each config)): bigrams}
+bigramCache = LRUCache(BIGRAM_CACHE_SIZE)
 
 
 def getBigrams(sortedLetters: str, configs: tuple = BIGRAMS_CONFIGS) -> tuple:
-    """This opens the bigram-list (the txt-file) and returns the letters and the frequencies of the required bigrams."""
-    if configs == BIGRAMS_CONFIGS and sortedLetters in bigramCache:
-        return bigramCache[sortedLetters]
+    """Returns the letters and the frequencies of the required bigrams. (Looked up in the loaded bigram-lists, see `bigram_corpus.py`)"""
+    cacheKey = (sortedLetters, tuple((config.path, config.weight) for config in configs))
+    bigrams = bigramCache.get(cacheKey)
+    if bigrams is not None:
+        return bigrams
     else:
-        # Prepare the bigram-letters
-        fullBigramList = []
-        for bigram in itertools.permutations(sortedLetters, 2):
-            fullBigramList.append(''.join(bigram))
-        # Add duplicate letter bigrams. ("aa", "ee", "nn", "rr", ...)
-        for letter in sortedLetters:
-            fullBigramList.append(letter+letter)
-
-        # Filter out the bigrams that contain the predefined filler-symbol.
-        bigramList = [b for b in fullBigramList if FILL_SYMBOL not in b]
-        # Make sure we also will get the replaced letters from the dictionary.
-        for i, bigram in enumerate(bigramList):
-            bigramList[i] = deAsciify(bigram)
-        # Create a set for faster lookups
-        bigramsSet = set(bigramList)
-
-        normalizedCorpora = []
-        for config in configs:
-            if config.weight <= 0:
-                continue
-
-            # Sum up the corpus's frequencies. Used for later normalization.
-            frequencySum = 0
-            with open(config.path, 'r', encoding='utf-8') as corpus:
-                for line in corpus:
-                    frequency = float(line[line.find(' ')+1:])
-                    frequencySum += frequency
-
-            # Read the file and normalize its contents.
-            normalizedCorpus = []
-            with open(config.path, 'r', encoding='utf-8') as corpus:
-                for line in corpus:
-                    bigram = line[:2].lower()
-                    if bigram in bigramsSet:
-                        frequency = float(line[line.find(' ')+1:])
-                        normalizedFrequency = frequency * config.weight / frequencySum
-                        normalizedCorpus.append((
-                            bigram,
-                            normalizedFrequency,
-                        ))
-            normalizedCorpora.append(normalizedCorpus)
-
-        bigramsDict = dict()
-        for corpus in normalizedCorpora:
-            for bigram, freq in corpus:
-                if bigram not in bigramsDict:
-                    bigramsDict[bigram] = freq
-                else:
-                    bigramsDict[bigram] += freq
+        # Make sure we also will get the replaced letters from the dictionary. The filler-symbol never is part of a bigram.
+        letters = deAsciify(sortedLetters.replace(FILL_SYMBOL, ''))
 
         bigrams = tuple(Bigram(characters, freq)
-                        for characters, freq in bigramsDict.items())
-        if configs == BIGRAMS_CONFIGS:
-            bigramCache[sortedLetters] = bigrams
+                        for characters, freq in bigram_corpus.getWeightedBigrams(letters, configs))
+        bigramCache.put(cacheKey, bigrams)
         return bigrams
 
 
@@ -585,8 +938,9 @@ def lowerStaticLetters(staticLetters: tuple) -> tuple:
     return tuple(lst)
 
 
-def getLayerPermutations(varLetters: str, staticLetters: tuple, layer2letters: str, layer3letters: str, layer4letters: str) -> tuple:
-    """Creates and returns a list of layouts."""
+def getLayerPermutations(varLetters: str, staticLetters: tuple, layer2letters: str, layer3letters: str, layer4letters: str, layerSymmetries=((), (), (), ())) -> tuple:
+    """Creates and returns a list of layouts.
+    Permutations that are symmetric versions of other permutations (see `symmetry.py`) are left out."""
 
     layer1layouts = getPermutations(varLetters, staticLetters)
     layer2layouts = ['']
@@ -615,44 +969,37 @@ def getLayerPermutations(varLetters: str, staticLetters: tuple, layer2letters: s
         else:
             print("Error: too many letters in fourth layer")
 
-    return layer1layouts, layer2layouts, layer3layouts, layer4layouts
+    return tuple(
+        getCanonicalPermutations(layouts, symmetries)
+        for layouts, symmetries in zip((layer1layouts, layer2layouts, layer3layouts, layer4layouts), layerSymmetries))
 
 
-def getPermutations(varLetters: str, staticLetters=[]) -> tuple:
-    """Returns all possible letter-positions (permutations) with the input letters."""
-
-    layouts = ['']*math.factorial(len(varLetters))
+def getPermutations(varLetters: str, staticLetters=[]) -> PermutationSpace:
+    """Returns all possible letter-positions (permutations) with the input letters.
+    The permutations are not stored, but created from their rank when they are accessed. (See `PermutationSpace`)"""
 
     if len(staticLetters) > 0:  # this only activates for layer 1 (which has static letters)
-        # try every layout
-        for layoutIteration, letterCombination in enumerate(itertools.permutations(varLetters)):
-            j = 0
-            for letterPlacement in range(LETTERS_PER_LAYER):
-                if staticLetters[letterPlacement] != '':
-                    layouts[layoutIteration] += staticLetters[letterPlacement]
-                else:
-                    layouts[layoutIteration] += letterCombination[j]
-                    j += 1
-
+        return PermutationSpace(varLetters, staticLetters[:LETTERS_PER_LAYER])
     else:  # This is used for all layers except for layer 1
-        # try every layout
-        for layoutIteration, letterCombination in enumerate(itertools.permutations(varLetters)):
-            layouts[layoutIteration] = ''.join(letterCombination)
+        return PermutationSpace(varLetters)
+
 
-    return tuple(layouts)
+def getCanonicalPermutations(permutations, layerSymmetries: tuple):
+    """Only keeps the permutations that come first among their symmetric versions. (See `symmetry.py`)"""
+    if not layerSymmetries or not isinstance(permutations, PermutationSpace):
+        return permutations
+    return PermutationSubset(
+        permutations, (rank for rank, layout in enumerate(permutations) if isCanonical(layout, layerSymmetries)))
 
 
-def fillAndPermuteLayout(letters: str) -> tuple:
+def fillAndPermuteLayout(letters: str) -> PermutationSpace:
     """Creates full layouts out of only a few letters, while avoiding redundancy.
     It is primarily important for layer 4, which many alphabets do not completely fill with letters."""
     missingSlotCount = LETTERS_PER_LAYER - len(letters)
     newLetters = letters + (FILL_SYMBOL * missingSlotCount)
 
-    permutations = itertools.permutations(newLetters)  # Get permutations
-    layouts = set(''.join(letterList)
-                  for letterList in permutations)  # Remove all duplicates
-
-    return tuple(layouts)
+    # Orderings which only differ in the positions of the fill-symbols are only created once.
+    return PermutationSpace(newLetters)
 
 
 def testLayouts(layouts: tuple, prevScores=None) -> tuple:
@@ -672,52 +1019,39 @@ def testLayouts(layouts: tuple, prevScores=None) -> tuple:
     # Filter out the previous bigrams if there are any that need filtering.
     if len(layoutLetters) > LETTERS_PER_LAYER:
         bigrams = filterBigrams(bigrams, [lastLayerLetters])
-
-    if USE_MULTIPROCESSING is True:
-        if prevScores:
-            if len(prevScores) > 1:
-                goodLayouts = []
-                goodScores = array("d", [])
-                # Prepare the group-sizes of the layout-groups for multiprocessing
-                groupBeginnings = []
-                for j in range(len(prevScores)):
-                    # Prepare the iterables for the later "pool.map"
-                    groupBeginnings.append(
-                        int((len(layouts) / len(prevScores)) * j))
-                groupSize = groupBeginnings[1]
-
-                # Prepare the layout-testing-function and its "static parameters"
-                testingFunction = partial(getLayoutScores_multiprocessing, [
-                                          layouts, bigrams, prevScores, groupSize])
-
-                # Using multithreading, test the layouts for their flow. Only test <= 20 at once.
-                maxNrProcesses = 15  # Max number of simultaneous processes
-                j = 0
-                while j < len(prevScores):
-                    resultsList = []
-
-                    # Using multithreading, test the layouts for their flow
-                    with multiprocessing.Pool(processes=len(prevScores[j:j+maxNrProcesses])) as pool:
-                        resultsList = pool.map(
-                            testingFunction, groupBeginnings[j:j+maxNrProcesses])
-
-                    # Add the results to the goodLayouts- and goodScores-lists
-                    for results in resultsList:
-                        goodLayouts.extend(results[0])
-                        goodScores.extend(results[1])
-                    j += maxNrProcesses
-                goodLayouts = tuple(goodLayouts)
-
-            else:
-                # Test the layouts for their flow
-                goodLayouts, goodScores = getLayoutScores(
-                    layouts, bigrams, prevScores)
-        else:
-            # Test the layouts for their flow
-            goodLayouts, goodScores = getLayoutScores(
-                layouts, bigrams, prevScores)
+    instrumentation.addStage(len(layouts), len(bigrams))
+
+    if USE_MULTIPROCESSING is True and not worker_pool.isWorkerProcess() and len(layouts) > MULTIPROCESSING_CHUNK_SIZE:
+        groupSize = int(len(layouts) / len(prevScores)) if prevScores else 0
+
+        # Put the layouts, previous scores and bigrams into shared memory, so the worker processes can read them without copying.
+        with SharedStageData() as sharedData:
+            sharedData.addLayouts('layouts', layouts)
+            sharedData.addFloats('prevScores', prevScores)
+            sharedData.addBigramTable(getBigramTable(bigrams))
+
+            # Prepare the layout-testing-function and its "static parameters"
+            testingFunction = partial(getLayoutScores_multiprocessing, sharedData.descriptor, len(layouts[0]), groupSize, deadline.getEndTime())
+
+            # Using multiprocessing, test the layouts for their flow.
+            # Free workers pick up the next chunk, and each chunk's best layouts are merged as soon as they arrive.
+            goodEntries = []
+            chunkRanges = worker_pool.getChunkRanges(len(layouts))
+            nrOfSkippedLayouts = 0
+            for (chunkBeginning, chunkEnding), chunkEntries in zip(chunkRanges, worker_pool.getPool().imap(testingFunction, chunkRanges)):
+                if chunkEntries is None:
+                    nrOfSkippedLayouts += chunkEnding - chunkBeginning
+                else:
+                    goodEntries = mergeTopEntries((goodEntries, chunkEntries), NR_OF_STAGE_RESULTS)
+            if nrOfSkippedLayouts == len(layouts):
+                # The deadline was reached before any chunk was tested, but there have to be some results.
+                goodEntries = getLayoutScores_multiprocessing(sharedData.descriptor, len(layouts[0]), groupSize, None, chunkRanges[0])
+                nrOfSkippedLayouts -= chunkRanges[0][1] - chunkRanges[0][0]
+            if nrOfSkippedLayouts:
+                instrumentation.skipLayouts(nrOfSkippedLayouts)
+            goodLayouts, goodScores = entriesToResults(goodEntries, layouts)
     else:
-        # Test the layouts for their flow
+        # Test the layouts for their flow. (Without multiprocessing, they aren't split into chunks, so the deadline doesn't cut them short)
         goodLayouts, goodScores = getLayoutScores(
             layouts, bigrams, prevScores)
 
@@ -747,165 +1081,394 @@ def getAsciiArray() -> array:
     return array("B", [0]*256)
 
 
-def getLayoutScores(layouts: tuple, bigrams: tuple, prevScores=None) -> tuple:
-    """Tests the layouts and return their scores. It's only used when single-threading."""
+def getBigramTable(bigrams: tuple) -> tuple:
+    """Turns the bigrams into a table of fixed-width arrays: (letter1-ascii-codes, letter2-ascii-codes, frequencies)"""
+    return (
+        array("B", (bigram.letter1AsciiCode for bigram in bigrams)),
+        array("B", (bigram.letter2AsciiCode for bigram in bigrams)),
+        array("d", (bigram.frequency for bigram in bigrams)),
+    )
+
+
+def getLanguageBigramTable(sortedLetters: str, configs: tuple = BIGRAMS_CONFIGS) -> tuple:
+    """Returns the bigrams of all configs as one table: (letter1-ascii-codes, letter2-ascii-codes, (frequencies of each config))
+    Each config's frequencies are the ones it would have with a weight of 100%, so each row gives that language's own score."""
+    letters = deAsciify(sortedLetters.replace(FILL_SYMBOL, ''))
+    bigrams, frequencyRows = bigram_corpus.getFrequencyMatrix(letters, configs)
+    bigrams = tuple(asciify(bigram) for bigram in bigrams)
+    return (
+        array("B", (ord(bigram[0]) for bigram in bigrams)),
+        array("B", (ord(bigram[1]) for bigram in bigrams)),
+        frequencyRows,
+    )
+
+
+def getLanguageWeights(configs: tuple = BIGRAMS_CONFIGS) -> tuple:
+    """Returns the share each config has in the combined score. (Configs with a weight of 0 or less have none)"""
+    return tuple(config.weight / 100 if config.weight > 0 else 0.0 for config in configs)
 
+
+def getCombinedScore(scoreVector: array, weights: tuple = None) -> float:
+    """Returns the score of all languages together, which is the weighted sum of a layout's score vector."""
+    if weights is None:
+        weights = getLanguageWeights()
+    return sum(map(operator.mul, weights, scoreVector))
+
+
+def getScoreVectors(layouts, languageBigramTable: tuple) -> list:
+    """Scores the layouts for every language at once. (See `getLanguageBigramTable()`)
+    Returns one array per layout, which contains the score of each row of frequencies.
+    Where each bigram is on the layout is only looked up once, no matter how many languages there are."""
+    if USE_NUMPY:
+        return [array("d", vector.tobytes()) for vector in numpy_scoring.getScoreVectors(layouts, languageBigramTable)]
+
+    codes1, codes2, frequencyRows = languageBigramTable
     asciiArray = getAsciiArray()
-    nrLayouts = len(layouts)
-    scores = array("d", [0.0]*nrLayouts) # Create the empty scoring-list
+    scoreVectors = []
+    for layout in layouts:
+        for j, letter in enumerate(layout):
+            asciiArray[ord(letter)] = j  # Fill up asciiArray
+        placementScores = [SCORE_LIST[asciiArray[code1]][asciiArray[code2]] for code1, code2 in zip(codes1, codes2)]
+        scoreVectors.append(array("d", (sum(map(operator.mul, frequencies, placementScores)) for frequencies in frequencyRows)))
+    return scoreVectors
+
+
+def getLanguageScores(layouts) -> list:
+    """Returns the score vectors (see `getScoreVectors()`) of layouts which don't have to consist of the same letters.
+    The layouts with the same letters are scored together."""
+    groups = dict()
+    for idx, layout in enumerate(layouts):
+        groups.setdefault((''.join(sorted(layout.replace(FILL_SYMBOL, ''))), len(layout)), []).append(idx)
+
+    scoreVectors = [None] * len(layouts)
+    for (letters, _), indices in groups.items():
+        languageBigramTable = getLanguageBigramTable(letters)
+        for idx, scoreVector in zip(indices, getScoreVectors([layouts[idx] for idx in indices], languageBigramTable)):
+            scoreVectors[idx] = scoreVector
+    return scoreVectors
+
+
+def scoreLayouts(layouts, bigramTable: tuple, prevScores=None, groupSize: int = 0, offset: int = 0) -> array:
+    """Tests the flow of the layouts and returns their scores.
+    If there are `prevScores`, the layout `layouts[k]` is a combination of the previous layout number `(offset + k) // groupSize`,
+    so that layout's score gets added."""
+
+    if USE_NUMPY:
+        # Score all layouts in vectorized batches
+        scores = numpy_scoring.getLayoutScores(layouts, bigramTable)
+        if prevScores:
+            numpy_scoring.addPrevScores(scores, prevScores, groupSize, offset)
+        return array("d", scores.tobytes())
+
+    asciiArray = getAsciiArray()
+    scores = array("d", [0.0]*len(layouts)) # Create the empty scoring-list
+    bigramRows = tuple(zip(*bigramTable))
 
     # Test the flow of all the layouts.
     for k, layout in enumerate(layouts):
         for j, letter in enumerate(layout):
             asciiArray[ord(letter)] = j  # Fill up asciiArray
 
-        for bigram in bigrams: # Go through every bigram and see how well it flows.
-            firstLetterPlacement = asciiArray[bigram.letter1AsciiCode]
-            secondLetterPlacement = asciiArray[bigram.letter2AsciiCode]
-            scores[k] += bigram.frequency * SCORE_LIST[firstLetterPlacement][secondLetterPlacement]
+        for letter1AsciiCode, letter2AsciiCode, frequency in bigramRows: # Go through every bigram and see how well it flows.
+            firstLetterPlacement = asciiArray[letter1AsciiCode]
+            secondLetterPlacement = asciiArray[letter2AsciiCode]
+            scores[k] += frequency * SCORE_LIST[firstLetterPlacement][secondLetterPlacement]
 
     if prevScores:
         # Add the previous layouts' scores. (which weren't tested here. It would be redundant.)
-        for j in range(len(prevScores)):
-            groupSize = int((nrLayouts / len(prevScores)))
-            groupBeginning = groupSize * j
-            groupEnding = groupSize * (j+1)
+        for k in range(len(layouts)):
+            scores[k] += prevScores[(offset + k) // groupSize]
+
+    return scores
+
 
-            for k in range(groupBeginning, groupEnding):
-                scores[k] += prevScores[j]
+def getLayoutScores(layouts: tuple, bigrams: tuple, prevScores=None) -> tuple:
+    """Tests the layouts and return their scores. It's only used when single-threading."""
 
-    goodLayouts, goodScores = getTopScores(layouts, scores, 500)
+    groupSize = int(len(layouts) / len(prevScores)) if prevScores else 0
+    scores = scoreLayouts(layouts, getBigramTable(bigrams), prevScores, groupSize)
+
+    goodLayouts, goodScores = getTopScores(layouts, scores, NR_OF_STAGE_RESULTS)
     return goodLayouts, goodScores
 
 
-def getLayoutScores_multiprocessing(*args) -> tuple:
-    """This function tests the layouts and return their scores.
+def getLayoutScores_multiprocessing(sharedDataDescriptor: dict, layoutLength: int, groupSize: int, endTime: float, chunkRange: tuple) -> tuple:
+    """This function tests one chunk of layouts and returns the best ones as (score, index)-entries.
+    The layouts, previous scores and bigrams are read from shared memory. (See `SharedStageData`)
+    Returns `None` if the deadline (`endTime`) was reached before the chunk was tested.
     Only use this function when using multiprocessing. Otherwise, use [getLayoutScores]"""
+    if deadline.hasPassed(endTime):
+        return None
 
-    # Rename the input arguments
-    staticArgs = args[0]
-    mapArgs = args[1]
+    buffers = shared_buffers.attach(sharedDataDescriptor)
+    chunkBeginning, chunkEnding = chunkRange
+    layouts = LayoutBuffer(buffers['layouts'], layoutLength)[chunkBeginning:chunkEnding]
+    prevScores = buffers['prevScores'].cast('d')
+    scores = scoreLayouts(layouts, shared_buffers.readBigramTable(buffers), prevScores, groupSize, chunkBeginning)
 
-    groupSize = staticArgs[3]
+    # Only return the best scores (and their indices) for performance-reasons
+    topLayouts = TopLayouts(NR_OF_STAGE_RESULTS)
+    topLayouts.addScores(scores, chunkBeginning)
+    return topLayouts.getEntries()
 
-    groupBeginning = mapArgs
-    groupEnding = groupBeginning + groupSize
-    allLayouts = staticArgs[0]
 
-    layouts = allLayouts[groupBeginning: groupEnding]
-    bigrams = staticArgs[1]
+def testCombinedLayouts(prefixes: tuple, prevScores: array, permutations: tuple) -> tuple:
+    """Tests all combinations of the kept layouts (`prefixes`) and the permutations of the next layer.
+    The combinations are created and tested chunk by chunk, and only the best ones are kept,
+    so memory doesn't grow with the number of combinations. Returns the best combinations (and their scores)."""
 
-    asciiArray = getAsciiArray()
-    prevScore = staticArgs[2][int(groupBeginning/groupSize)]
-    scores = array("d", [prevScore]*groupSize)
+    if DEBUG_MODE is True:
+        print(f'DEBUG: {permutations[0]}')
 
-    # Test the flow of all the layouts.
-    for k, layout in enumerate(layouts):
-        for j, letter in enumerate(layout):
-            asciiArray[ord(letter)] = j  # Fill up asciiArray
+    # Get the bigrams that contain at least one letter of the new layer
+    bigrams = getBigrams(''.join(sorted(prefixes[0] + permutations[0])))
+    bigrams = filterBigrams(bigrams, [permutations[0]])
+    bigramTable = getBigramTable(bigrams)
+    instrumentation.addStage(len(prefixes) * len(permutations), len(bigrams))
+
+    if USE_SEPARABLE_SCORING is True:
+        scorer = CombinationScorer(len(prefixes[0]), permutations, bigramTable)
+    else:
+        scorer = None
+    # Test this many prefixes at once, so that the scores of (roughly) one chunk of layouts are in memory.
+    prefixChunkSize = max(1, MULTIPROCESSING_CHUNK_SIZE // len(permutations))
+
+    topLayouts = TopLayouts(NR_OF_STAGE_RESULTS)
+    if USE_MULTIPROCESSING is True and not worker_pool.isWorkerProcess() and len(prefixes) > prefixChunkSize:
+        # Put the stage's data into shared memory, so the worker processes can read it without copying.
+        with SharedStageData() as sharedData:
+            sharedData.addLayouts('prefixes', prefixes)
+            sharedData.addFloats('prevScores', prevScores)
+            sharedData.addLayouts('permutations', permutations)
+            sharedData.addBigramTable(bigramTable)
+            if scorer is not None:
+                sharedData.addFloats('intraScores', scorer.intraScores)
+
+            testingFunction = partial(
+                getCombinedLayoutScores_multiprocessing, sharedData.descriptor, len(prefixes[0]), len(permutations[0]), deadline.getEndTime())
+            # Free workers pick up the next chunk of prefixes, and each chunk's best layouts are merged as soon as they arrive.
+            # The best prefixes are the last ones, so they're tested first (in case the deadline is reached).
+            chunkRanges = worker_pool.getChunkRanges(len(prefixes), prefixChunkSize)[::-1]
+            nrOfSkippedPrefixes = 0
+            for (chunkBeginning, chunkEnding), chunkEntries in zip(chunkRanges, worker_pool.getPool().imap(testingFunction, chunkRanges)):
+                if chunkEntries is None:
+                    nrOfSkippedPrefixes += chunkEnding - chunkBeginning
+                else:
+                    topLayouts.addEntries(chunkEntries)
+            if nrOfSkippedPrefixes == len(prefixes):
+                # The deadline was reached before any chunk was tested, but there have to be some results.
+                topLayouts.addEntries(getCombinedLayoutScores_multiprocessing(
+                    sharedData.descriptor, len(prefixes[0]), len(permutations[0]), None, chunkRanges[0]))
+                nrOfSkippedPrefixes -= chunkRanges[0][1] - chunkRanges[0][0]
+            if nrOfSkippedPrefixes:
+                instrumentation.skipLayouts(nrOfSkippedPrefixes * len(permutations))
+    else:
+        # The best prefixes are the last ones, so they're tested first (in case the deadline is reached).
+        for chunkBeginning in reversed(range(0, len(prefixes), prefixChunkSize)):
+            chunkEnding = chunkBeginning + prefixChunkSize
+            if chunkEnding < len(prefixes) and deadline.isReached():
+                # Keep the best layouts found so far.
+                instrumentation.skipLayouts(chunkEnding * len(permutations))
+                break
+            chunkPrefixes = prefixes[chunkBeginning:chunkEnding]
+            scores = scoreCombinations(
+                chunkPrefixes, prevScores[chunkBeginning:chunkEnding], permutations, bigramTable, scorer)
+            topLayouts.addScores(scores, chunkBeginning*len(permutations))
 
-        for bigram in bigrams: # Go through every bigram and see how well it flows.
-            firstLetterPlacement = asciiArray[bigram.letter1AsciiCode]
-            secondLetterPlacement = asciiArray[bigram.letter2AsciiCode]
-            scores[k] += bigram.frequency * SCORE_LIST[firstLetterPlacement][secondLetterPlacement]
+    # Only the kept layouts are turned into strings
+    return topLayouts.getResults(CombinedLayouts(prefixes, permutations))
 
-    # Only use the best scores (and layouts) for performance-reasons
-    goodLayouts, goodScores = getTopScores(layouts, scores, 500)
-    return goodLayouts, goodScores
 
+def scoreCombinations(prefixes, prevScores, permutations, bigramTable: tuple, scorer: CombinationScorer = None) -> array:
+    """Returns the scores of all combinations of `prefixes` and `permutations`, in the order of `combinePermutations()`.
+    Uses the `scorer` if there is one. Otherwise, every combined layout is scored from scratch."""
+    if scorer is not None:
+        return scorer.scorePrefixes(prefixes, prevScores)
+    layouts = tuple(combinePermutations(prefixes, permutations))
+    return scoreLayouts(layouts, bigramTable, prevScores, len(permutations))
 
-def getTopScores(layouts: tuple, scores: array, nrOfBest=NR_OF_BEST_LAYOUTS) -> tuple:
-    """Returns the best [whatever you set "nrOfBestPermutations" to] layouts with their scores.
-    The LAST items of those lists should be the best ones."""
 
-    # Make sure we don't try to get more scores than actually exist
-    if nrOfBest > len(scores):
-        nrOfBest = len(scores)
+# The `CombinationScorer` of the current stage in a worker process. {shared data descriptor: scorer}
+combinationScorerCache = dict()
 
-    lenScores = len(scores)
-    indices = range(lenScores)
 
-    # BEFORE sorting the lists, make sure they're not unnecessarily large
-    while lenScores > nrOfBest*3 and lenScores > LETTERS_PER_LAYER*2:
-        mean = statistics.mean(scores[idx] for idx in indices)
-        # Get all indices & scores that are above the mean of the remaining scores.
-        # This more than halves remaining scores.
-        indices = [i for i, score in enumerate(scores) if score >= mean]
+def getCombinedLayoutScores_multiprocessing(sharedDataDescriptor: dict, prefixLength: int, layerLength: int, endTime: float, chunkRange: tuple) -> list:
+    """Tests the combinations of one chunk of prefixes with all permutations and returns the best ones as (score, index)-entries.
+    The stage's data is read from shared memory. (See `testCombinedLayouts()`)
+    Returns `None` if the deadline (`endTime`) was reached before the chunk was tested.
+    Only use this function when using multiprocessing."""
+    if deadline.hasPassed(endTime):
+        return None
 
-        newLength = len(indices)
-        if newLength == lenScores:
-            # If scores aren't filtered anymore, stop the loop
-            break
-        else:
-            lenScores = newLength
-    else:
-        # Do this after the loop has finished.
-        # Get the remaining (best) scores using the filtered indices.
-        scores = [scores[idx] for idx in indices]
+    buffers = shared_buffers.attach(sharedDataDescriptor)
+    permutations = LayoutBuffer(buffers['permutations'], layerLength)
+    bigramTable = shared_buffers.readBigramTable(buffers)
+
+    scorer = None
+    if 'intraScores' in buffers:
+        # The scorer only has to be prepared once per stage
+        cacheKey = tuple(sharedDataDescriptor.values())
+        if cacheKey not in combinationScorerCache:
+            combinationScorerCache.clear()
+            combinationScorerCache[cacheKey] = CombinationScorer(
+                prefixLength, permutations, bigramTable, array("d", buffers['intraScores'].cast('d')))
+        scorer = combinationScorerCache[cacheKey]
+
+    chunkBeginning, chunkEnding = chunkRange
+    prefixes = LayoutBuffer(buffers['prefixes'], prefixLength)[chunkBeginning:chunkEnding]
+    prevScores = buffers['prevScores'].cast('d')[chunkBeginning:chunkEnding]
+    scores = scoreCombinations(prefixes, prevScores, permutations, bigramTable, scorer)
+
+    # Only return the best scores (and their indices) for performance-reasons
+    topLayouts = TopLayouts(NR_OF_STAGE_RESULTS)
+    topLayouts.addScores(scores, chunkBeginning*len(permutations))
+    return topLayouts.getEntries()
 
-    # Sort scores & indices. This is way faster thanks to the above while-loop
-    sortedScoreIdxTuples = sorted(zip(scores, indices))
 
-    topScores, topIndices = zip(*sortedScoreIdxTuples[-nrOfBest:])
+def getTopScores(layouts: tuple, scores: array, nrOfBest=NR_OF_BEST_LAYOUTS) -> tuple:
+    """Returns the best [whatever you set "nrOfBestPermutations" to] layouts with their scores.
+    The LAST items of those lists should be the best ones. (Ties are ordered as described in `selection.py`)"""
+
+    topIndices = selectTopIndices(scores, nrOfBest)
     topLayouts = tuple(layouts[idx] for idx in topIndices)
-    topScores = array("d", topScores)
+    topScores = array("d", (scores[idx] for idx in topIndices))
 
     return topLayouts, topScores
 
 
-def combinePermutations(list1: tuple, list2: tuple) -> tuple:
-    """Creates all possible permutations of two tuples while still keeping them in the right order. (first, second) (a, then b)"""
-    listOfStrings = []
-
+def combinePermutations(list1, list2) -> Iterator[str]:
+    """Lazily creates all possible permutations of two tuples while still keeping them in the right order. (first, second) (a, then b)"""
     for a in list1:
-        listOfStrings.extend(a + b for b in list2)
-
-    return tuple(listOfStrings)
+        for b in list2:
+            yield a + b
 
 
 def greedyOptimization(layouts: tuple, scores: array, info: InfoWithTime = None) -> tuple:
-    """Randomly switches letters in each of the layouts to see whether the layouts can be improved this way."""
+    """Swaps letters in each of the layouts to see whether the layouts can be improved this way.
+    Each layout climbs by always performing the best-improving 2-letter-swap until no swap improves it anymore.
+    The best layouts climb first, and no more climbs are started once the deadline is reached."""
 
+    phase = instrumentation.beginPhase('Greedy optimization')
     optimizedLayouts = dict(zip(layouts, scores))
-    asciiArray = getAsciiArray()
     bigrams = getBigrams(''.join(sorted(layouts[0])))
     if DEBUG_MODE:
         print(f'DEBUG: Greedy optimization with {len(layouts)} layouts')
     else:
         info.set_status(f'{len(layouts)} layouts] [Greedy optimization')
-    for layout, score in zip(layouts, deepcopy(scores)):
-        optimizing = True
-        while optimizing is True:
-            layoutPermutations = performLetterSwaps(layout)
-            for i, permutatedLayout in enumerate(layoutPermutations):
-                permutatedScore = testSingleLayout(
-                    permutatedLayout, asciiArray, bigrams)
-                if permutatedScore > score:
-                    layout = permutatedLayout
-                    score = permutatedScore
-                    break
-                elif i+1 == len(layoutPermutations):
-                    optimizing = False
-        if layout not in optimizedLayouts:
-            optimizedLayouts[layout] = score
+
+    if USE_MULTIPROCESSING is True and not worker_pool.isWorkerProcess() and len(layouts) > 1:
+        # Every worker process climbs from a shard of the layouts.
+        # The shards' optima are added in the order of the layouts, so the results are the same as without multiprocessing.
+        # (The best layouts are in the last shard, which is why the shards are handed out backwards)
+        shards = [layouts[beginning:ending] for beginning, ending in worker_pool.getChunkRanges(len(layouts))]
+        shardResults = list(worker_pool.getPool().imap(
+            partial(climbLayouts_multiprocessing, dict(replacedWithAscii), deadline.getEndTime()), shards[::-1]))
+        stats = dict()
+        for optima, optimumScores, shardStats in reversed(shardResults):
+            for layout, score in zip(optima, optimumScores):
+                if layout not in optimizedLayouts:
+                    optimizedLayouts[layout] = score
+                    phase.layoutsScored += 1
+            for name, amount in shardStats.items():
+                stats[name] = stats.get(name, 0) + amount
+    else:
+        asciiArray = getAsciiArray()
+        swapScorer = SwapScorer(bigrams)
+        optima, nrOfSkippedClimbs = climbBestFirst(swapScorer, layouts)
+        for layout in optima:
+            if layout not in optimizedLayouts:
+                # Calculate the final score from scratch to avoid accumulated rounding errors
+                optimizedLayouts[layout] = testSingleLayout(layout, asciiArray, bigrams)
+                phase.layoutsScored += 1
+        stats = dict(swapScorer.getStats(), skippedClimbs=nrOfSkippedClimbs)
     if DEBUG_MODE:
         print(f'DEBUG: Finished with {len(optimizedLayouts)} layouts')
 
+    phase.layoutsGenerated = len(optimizedLayouts) - len(layouts)
+    phase.bigramCounts.append(len(bigrams))
+    instrumentation.count('climbs', len(layouts) - stats['skippedClimbs'])
+    for name, amount in stats.items():
+        instrumentation.count(name, amount)
+    if stats['skippedClimbs']:
+        instrumentation.markIncomplete()
+    instrumentation.endPhase()
+
     return tuple(optimizedLayouts.keys()), array("d", optimizedLayouts.values())
 
 
-def performLetterSwaps(layout: str) -> set:
-    """Get all layouts that are possible through 2-letter-swaps."""
-    layouts = set([layout])
-    originalLayout = tuple(layout)
-    for idx1 in range(len(layout)):
-        for idx2 in range(idx1+1, len(layout)):
-            copy = list(originalLayout)
-            copy[idx1], copy[idx2] = copy[idx2], copy[idx1]
-            layoutStr = ''.join(copy)
-            if layoutStr not in layouts:
-                layouts.add(layoutStr)
-    return layouts
+def climbBestFirst(swapScorer: SwapScorer, layouts: tuple) -> tuple:
+    """Climbs from the layouts to their local optima, starting with the last (best) one, until the deadline is reached.
+    Returns the optima of the layouts that climbed (in the order of `layouts`) and the number of layouts that didn't."""
+    optima = []
+    for layout in reversed(layouts):
+        if deadline.isReached():
+            break
+        optima.append(swapScorer.climb(layout))
+    optima.reverse()
+    return tuple(optima), len(layouts) - len(optima)
+
+
+def climbLayouts_multiprocessing(replacements: dict, endTime: float, layouts: tuple) -> tuple:
+    """Climbs from each of the layouts to its local optimum (see `greedyOptimization()`) in a worker process.
+    Returns the optima (in the order of `layouts`), their scores and how much work the climbs took. (See `SwapScorer.getStats()`)"""
+    # Worker processes that weren't forked don't know which ascii-chars replace which letters, or when the deadline is.
+    replacedWithAscii.update(replacements)
+    deadline.setEndTime(endTime)
+    asciiArray = getAsciiArray()
+    bigrams = getBigrams(''.join(sorted(layouts[0])))
+    swapScorer = SwapScorer(bigrams)
+
+    optima, nrOfSkippedClimbs = climbBestFirst(swapScorer, layouts)
+    # Calculate the final scores from scratch to avoid accumulated rounding errors
+    optimumScores = array("d", (testSingleLayout(layout, asciiArray, bigrams) for layout in optima))
+    return optima, optimumScores, dict(swapScorer.getStats(), skippedClimbs=nrOfSkippedClimbs)
+
+
+def exactOptimization(layouts: tuple, scores: array, staticLetters: tuple) -> tuple:
+    """Searches the best possible layout with branch-and-bound (see `exact_solver.py`), starting with the best layout found so far.
+    Displays the proven upper bound and the gap. If a better layout is found, it is added to the results."""
+    from exact_solver import BranchAndBound
+
+    (bestLayout,), (bestScore,) = getTopScores(layouts, scores, 1)
+    bigrams = getBigrams(''.join(sorted(bestLayout)))
+    fixedLetters = {position: letter for position, letter in enumerate(staticLetters) if letter}
+    solver = BranchAndBound(bestLayout, bigrams, len(bestLayout), fixedLetters)
+
+    if DEBUG_MODE:
+        print('Exact search')
+    else:
+        info = InfoWithTime('Exact search')
+        info.set_status('Branch and bound')
+    instrumentation.beginPhase('Exact search')
+    # Stop at the deadline, if it comes before the time limit.
+    timeLimit = EXACT_SOLVER_TIME_LIMIT
+    remainingTime = deadline.getRemainingTime()
+    if remainingTime is not None and (not timeLimit or remainingTime < timeLimit):
+        # (At least a tiny bit of time, because `0` means no limit)
+        timeLimit = max(remainingTime, 1e-6)
+    result = solver.solve(bestLayout, timeLimit, EXACT_SOLVER_GAP / 100)
+    if timeLimit != EXACT_SOLVER_TIME_LIMIT and not result.isComplete:
+        instrumentation.markIncomplete()
+    instrumentation.count('nodes', result.nrOfNodes)
+    instrumentation.endPhase()
+    if not DEBUG_MODE:
+        info.set_done()
+        write('\n')
+
+    gap = f'{result.gap*100:.4f}%' if result.gap != float('inf') else 'unknown'
+    Info(f'Best score: {result.score:.6f},  Upper bound: {result.upperBound:.6f},  Gap: {gap}')
+    write('\n')
+    if result.isComplete:
+        Info(f'Search completed ({result.nrOfNodes} partial layouts)')
+    else:
+        Info(f'Time limit reached ({result.nrOfNodes} partial layouts)')
+    write('\n\n')
+
+    if result.layout is not None and result.score > bestScore and result.layout not in layouts:
+        layouts = tuple(layouts) + (result.layout,)
+        scores = array("d", scores)
+        scores.append(testSingleLayout(result.layout, getAsciiArray(), bigrams))
+    return layouts, scores
 
 
 def showDataInTerminal(
@@ -923,16 +1486,16 @@ def showDataInTerminal(
 
         layouts, _ = getTopScores(layouts, scores, SHOW_TOP_LAYOUTS)
         del scores
-        for idx, layout in enumerate(reversed(layouts)):
-            printLayoutData(layout, placing=idx+1)
+        for idx, (layout, scoreVector) in enumerate(zip(reversed(layouts), getLanguageScores(layouts[::-1]))):
+            printLayoutData(layout, scoreVector, placing=idx+1)
         displaySeparator()
 
     if TEST_CUSTOM_LAYOUTS is True:
         write('\n')
         displayTitle(f'Custom layouts')
 
-        for name, layout in customLayouts.items():
-            printLayoutData(layout, name=name)
+        for (name, layout), scoreVector in zip(customLayouts.items(), getLanguageScores(tuple(customLayouts.values()))):
+            printLayoutData(layout, scoreVector, name=name)
 
     if SHOW_GENERAL_STATS is True:
         # Get all bigrams that actually can be written using this layout.
@@ -1003,30 +1566,10 @@ def layoutVisualisation(layout: str) -> str:
     return blueprint.format(*layout)
 
 
-def getConfigSpecificData(layout: str) -> list:
-    """Get all necessary `ConfigSpecificResults`s, according to the provided layout & config."""
-
-    layout = ''.join(letter for letter in layout if letter != FILL_SYMBOL)
-    configSpecificData = [ConfigSpecificResults(
-        "All",
-        100,
-        getBigrams(layout),
-    )]
-    for config in BIGRAMS_CONFIGS:
-        originalWeight = config.weight
-        fullWeightConfig = config.fullWeightClone()
-
-        configSpecificData.append(ConfigSpecificResults(
-            config.name,
-            originalWeight,
-            getBigrams(layout, (fullWeightConfig, )),
-        ))
-    return configSpecificData
-
-
-def printLayoutData(layout: str, placing: int = None, name: str = None) -> None:
+def printLayoutData(layout: str, scoreVector: array = None, placing: int = None, name: str = None) -> None:
     """A function that positions and prints information
-    next to the layout-display-string for more compact visuals."""
+    next to the layout-display-string for more compact visuals.
+    `scoreVector` holds the layout's score for each language (see `getLanguageScores()`). It's calculated if it's missing."""
 
     displaySeparator()
     visLayout = layoutVisualisation(layout)
@@ -1052,19 +1595,19 @@ def printLayoutData(layout: str, placing: int = None, name: str = None) -> None:
     print(visLayoutLines[lineToPrint])
     lineToPrint += 1
 
-    configSpecificData = getConfigSpecificData(layout)
-    maxVisNameLen = max(len(i.name) for i in configSpecificData if i.name != 'All')
-    asciiArray = getAsciiArray()
-    for data in configSpecificData:
+    if scoreVector is None:
+        scoreVector = getLanguageScores((layout,))[0]
+    # The combined score first, then the one of each language
+    scoresToPrint = [("All", 100, getCombinedScore(scoreVector))]
+    scoresToPrint.extend((config.name, config.weight, score) for config, score in zip(BIGRAMS_CONFIGS, scoreVector))
+    maxVisNameLen = max(len(config.name) for config in BIGRAMS_CONFIGS)
+    for cfgName, weight, score in scoresToPrint:
         try:
             visLine = visLayoutLines[lineToPrint]
         except IndexError:
             visLine = ""
 
         lineToPrint += 1
-        cfgName = data.name
-        weight = data.weight
-        score = testSingleLayout(layout, asciiArray, data.bigrams)
         if cfgName == "All":
             visName = "All Languages "
             offset = 0
@@ -1104,4 +1647,6 @@ if __name__ == '__main__':
     try:
         main()
     finally:
+        if USE_MULTIPROCESSING is True:
+            worker_pool.closePool()
         Cursor.show()
@@ -0,0 +1,107 @@
+"""Vectorized layout scoring. Only used when `USE_NUMPY` is enabled in `config.py`."""
+from config import SCORE_LIST, NUMPY_CHUNK_SIZE, USE_NUMPY
+
+# Importing NumPy takes longer than everything else at startup, so it's only imported if it's going to be used.
+np = None
+if USE_NUMPY:
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+from layout_encoding import LayoutBuffer
+
+
+def isAvailable() -> bool:
+    """Returns whether NumPy could be imported. (Always `False` if `USE_NUMPY` is disabled)"""
+    return np is not None
+
+
+scoreMatrixCache = []
+
+
+def getScoreMatrix():
+    """Returns a dense (float64) copy of `SCORE_LIST`.
+    Converting the float32 values to float64 is exact, so scores stay identical to the ones of `testSingleLayout()`."""
+    if not scoreMatrixCache:
+        scoreMatrixCache.append(np.array([list(row) for row in SCORE_LIST], dtype=np.float64))
+    return scoreMatrixCache[0]
+
+
+def getBigramArrays(bigramTable: tuple) -> tuple:
+    """Turns a bigram table (see `getBigramTable()` in main.py) into the arrays needed for batch scoring:
+    (letter1-codes, letter2-codes, frequencies)"""
+    codes1, codes2, frequencies = bigramTable
+    return (
+        np.frombuffer(codes1, dtype=np.uint8).astype(np.intp),
+        np.frombuffer(codes2, dtype=np.uint8).astype(np.intp),
+        np.frombuffer(frequencies, dtype=np.float64),
+    )
+
+
+def getCharMatrix(layouts) -> 'np.ndarray':
+    """Returns the (asciified) layouts as a matrix of their letters' ascii-codes.
+    Layouts which already are stored as bytes (`LayoutBuffer`s) are used without copying them."""
+    if isinstance(layouts, LayoutBuffer):
+        return np.frombuffer(layouts.buffer, dtype=np.uint8).reshape(len(layouts), layouts.layoutLength)
+    return np.frombuffer(''.join(layouts).encode('latin-1'), dtype=np.uint8).reshape(len(layouts), len(layouts[0]))
+
+
+def encodeLayouts(layouts) -> 'np.ndarray':
+    """Encodes a batch of (asciified) layouts as a position matrix.
+    `positions[k, ord(letter)]` is the position of `letter` in `layouts[k]`, just like `asciiArray` does it for a single layout."""
+    chars = getCharMatrix(layouts)
+    nrLayouts, layoutLength = chars.shape
+    positions = np.zeros((nrLayouts, 256), dtype=np.uint8)
+    positions[np.arange(nrLayouts)[:, None], chars] = np.arange(layoutLength, dtype=np.uint8)
+    return positions
+
+
+def scoreLayoutBatch(layouts, bigramArrays: tuple, positionOffset: int = 0) -> 'np.ndarray':
+    """Scores a batch of layouts which all consist of the same letters.
+    If the layouts are only a part of the full layouts (one layer), `positionOffset` is the position of their first letter.
+    The bigram-contributions are summed up sequentially (`cumsum`) in the order of `bigrams`,
+    which makes the results bit-for-bit identical to the pure-python loop."""
+    codes1, codes2, frequencies = bigramArrays
+    if len(frequencies) == 0:
+        return np.zeros(len(layouts), dtype=np.float64)
+
+    positions = encodeLayouts(layouts)
+    scoreMatrix = getScoreMatrix()[positionOffset:, positionOffset:]
+    products = scoreMatrix[positions[:, codes1], positions[:, codes2]]
+    products *= frequencies
+    return np.cumsum(products, axis=1)[:, -1]
+
+
+def getLayoutScores(layouts, bigramTable: tuple, chunkSize: int = NUMPY_CHUNK_SIZE, positionOffset: int = 0) -> 'np.ndarray':
+    """Scores all layouts, `chunkSize` layouts at a time, and returns their scores."""
+    bigramArrays = getBigramArrays(bigramTable)
+    scores = np.empty(len(layouts), dtype=np.float64)
+    for chunkBeginning in range(0, len(layouts), chunkSize):
+        chunkEnding = min(chunkBeginning + chunkSize, len(layouts))
+        scores[chunkBeginning:chunkEnding] = scoreLayoutBatch(
+            layouts[chunkBeginning:chunkEnding], bigramArrays, positionOffset)
+    return scores
+
+
+def getScoreVectors(layouts, languageBigramTable: tuple, chunkSize: int = NUMPY_CHUNK_SIZE) -> 'np.ndarray':
+    """Scores all layouts for every row of frequencies at once (see `getLanguageBigramTable()` in main.py).
+    Returns a (layouts × rows)-matrix: The placement-scores of each batch's bigrams are multiplied with the whole frequency matrix."""
+    codes1, codes2, frequencyRows = languageBigramTable
+    codes1 = np.frombuffer(codes1, dtype=np.uint8).astype(np.intp)
+    codes2 = np.frombuffer(codes2, dtype=np.uint8).astype(np.intp)
+    frequencies = np.array([np.frombuffer(row, dtype=np.float64) for row in frequencyRows]).reshape(len(frequencyRows), len(codes1))
+
+    vectors = np.empty((len(layouts), len(frequencyRows)), dtype=np.float64)
+    for chunkBeginning in range(0, len(layouts), chunkSize):
+        chunkEnding = min(chunkBeginning + chunkSize, len(layouts))
+        positions = encodeLayouts(layouts[chunkBeginning:chunkEnding])
+        placementScores = getScoreMatrix()[positions[:, codes1], positions[:, codes2]]
+        vectors[chunkBeginning:chunkEnding] = placementScores @ frequencies.T
+    return vectors
+
+
+def addPrevScores(scores: 'np.ndarray', prevScores, groupSize: int, offset: int = 0) -> None:
+    """Adds the previous layouts' scores: `scores[k]` belongs to the previous layout number `(offset + k) // groupSize`.
+    (See `combinePermutations()`)"""
+    groups = (np.arange(len(scores)) + offset) // groupSize
+    scores += np.asarray(prevScores, dtype=np.float64)[groups]
@@ -0,0 +1,80 @@
+"""A persistent store of the results of finished runs.
+
+The results are stored under the run's fingerprint (see `fingerprints.py`), which covers exactly the inputs that influence the search.
+Rerunning with only different display-settings (`SHOW_TOP_LAYOUTS`, `CUSTOM_LAYOUTS`, ...) reuses the stored results,
+while any change of the inputs leads to a different fingerprint and a new search.
+
+Besides that, the best layouts of every run are stored with their score in each language ("candidates").
+Runs which only differ in the weights of the languages share them, so they can be re-ranked with new weights without a new search."""
+import heapq
+import os
+import pickle
+
+from config import RESULT_CACHE_DIRECTORY, RESULT_CACHE_CANDIDATES
+from checkpoints import dumpAtomically
+
+RESULT_CACHE_VERSION = 1
+
+
+def getResultPath(fingerprint: str) -> str:
+    """Returns where the results of a run with this fingerprint are stored."""
+    return os.path.join(RESULT_CACHE_DIRECTORY, f'{fingerprint}.pickle')
+
+
+def loadResults(fingerprint: str) -> tuple:
+    """Returns the (layouts, scores) of an earlier run with this fingerprint, or `None` if there is none."""
+    path = getResultPath(fingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as resultFile:
+            version, resultFingerprint, results = pickle.load(resultFile)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if version != RESULT_CACHE_VERSION or resultFingerprint != fingerprint:
+        return None
+    return results
+
+
+def saveResults(fingerprint: str, layouts, scores) -> None:
+    """Stores the results of a finished run."""
+    dumpAtomically(getResultPath(fingerprint), (RESULT_CACHE_VERSION, fingerprint, (layouts, scores)))
+
+
+def getCandidatePath(candidateFingerprint: str) -> str:
+    """Returns where the candidates with this fingerprint (see `fingerprints.getCandidateFingerprint()`) are stored."""
+    return os.path.join(RESULT_CACHE_DIRECTORY, f'candidates_{candidateFingerprint}.pickle')
+
+
+def loadCandidates(candidateFingerprint: str) -> dict:
+    """Returns the stored layouts and their scores in each language ({layout: score vector}), or `None` if there are none."""
+    path = getCandidatePath(candidateFingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as candidateFile:
+            version, storedFingerprint, candidates = pickle.load(candidateFile)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    if version != RESULT_CACHE_VERSION or storedFingerprint != candidateFingerprint:
+        return None
+    return candidates
+
+
+def addCandidates(candidateFingerprint: str, layouts, scoreVectors) -> None:
+    """Adds layouts and their score vectors (one score per language, in the order of `BIGRAMS_CONFIGS`) to the stored candidates."""
+    candidates = loadCandidates(candidateFingerprint) or dict()
+    candidates.update(zip(layouts, scoreVectors))
+    candidates = getBestCandidates(candidates, RESULT_CACHE_CANDIDATES)
+    dumpAtomically(getCandidatePath(candidateFingerprint), (RESULT_CACHE_VERSION, candidateFingerprint, candidates))
+
+
+def getBestCandidates(candidates: dict, nrPerLanguage: int) -> dict:
+    """Returns only the candidates which are among the best `nrPerLanguage` layouts in at least one language."""
+    if len(candidates) <= nrPerLanguage:
+        return candidates
+    nrOfLanguages = min(len(scoreVector) for scoreVector in candidates.values())
+    bestLayouts = set()
+    for language in range(nrOfLanguages):
+        bestLayouts.update(heapq.nlargest(nrPerLanguage, candidates, key=lambda layout: candidates[layout][language]))
+    return {layout: scoreVector for layout, scoreVector in candidates.items() if layout in bestLayouts}
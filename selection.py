@@ -0,0 +1,82 @@
+"""Selection of the best layouts.
+
+All functions here rank layouts by (score, index): The higher the score, the better the layout.
+Of two layouts with the same score, the one with the higher index (the one that came later) is better.
+Results are always returned in ascending order, so the LAST items are the best ones.
+This makes results reproducible, no matter whether NumPy is used or not."""
+import heapq
+import itertools
+from array import array
+
+from config import USE_NUMPY
+import numpy_scoring
+
+
+def selectTopIndices(scores, nrOfBest: int) -> list:
+    """Returns the indices of the `nrOfBest` best scores, sorted from worst to best. (Single pass, no full sort)"""
+    nrOfBest = min(nrOfBest, len(scores))
+    if nrOfBest <= 0:
+        return []
+
+    if USE_NUMPY:
+        np = numpy_scoring.np
+        scores = np.asarray(scores, dtype=np.float64)
+        if nrOfBest < len(scores):
+            # The score every selected layout has to reach
+            threshold = scores[np.argpartition(scores, len(scores) - nrOfBest)[len(scores) - nrOfBest]]
+            better = np.flatnonzero(scores > threshold)
+            # Layouts with exactly the threshold-score fill the remaining places. The later ones win.
+            tied = np.flatnonzero(scores == threshold)
+            indices = np.concatenate((better, tied[len(tied) - (nrOfBest - len(better)):]))
+        else:
+            indices = np.arange(len(scores))
+        return indices[np.lexsort((indices, scores[indices]))].tolist()
+
+    bestEntries = heapq.nlargest(nrOfBest, zip(scores, itertools.count()))
+    return [idx for _, idx in reversed(bestEntries)]
+
+
+def mergeTopEntries(entryLists, nrOfBest: int) -> list:
+    """K-way merge of (score, index)-lists which each are sorted from worst to best (like `TopLayouts.getEntries()`).
+    Indices have to be unique across all lists. Returns the `nrOfBest` best entries, sorted from worst to best."""
+    merged = heapq.merge(*(reversed(entries) for entries in entryLists), reverse=True)
+    return list(reversed(list(itertools.islice(merged, nrOfBest))))
+
+
+class TopLayouts:
+    """Keeps the `nrOfBest` best layouts of a stream of scored layouts in a fixed-size min-heap,
+    so memory does not grow with the number of tested layouts.
+    Layouts are only kept as (score, index)-entries, where the index is the layout's position in the whole stream.
+    They are turned into actual layouts by `getResults()`."""
+
+    def __init__(self, nrOfBest: int):
+        self.nrOfBest = nrOfBest
+        # The worst kept entry is always at `heap[0]`.
+        self.heap = []
+
+    def addScores(self, scores, offset: int = 0) -> None:
+        """Adds the scores of a part of the stream. `scores[k]` belongs to the layout with the index `offset + k`."""
+        self.addEntries((scores[k], offset + k) for k in selectTopIndices(scores, self.nrOfBest))
+
+    def addEntries(self, entries) -> None:
+        """Adds (score, index)-entries, for example the ones of another `TopLayouts` (`other.getEntries()`)."""
+        heap = self.heap
+        for entry in entries:
+            if len(heap) < self.nrOfBest:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heappushpop(heap, entry)
+
+    def getEntries(self) -> list:
+        """Returns the kept (score, index)-entries, sorted from worst to best."""
+        return sorted(self.heap)
+
+    def getResults(self, layouts) -> tuple:
+        """Returns the kept layouts and their scores. The LAST items of those lists are the best ones.
+        `layouts[index]` has to be the layout with that index in the stream. (It can be a lazy sequence)"""
+        return entriesToResults(self.getEntries(), layouts)
+
+
+def entriesToResults(entries: list, layouts) -> tuple:
+    """Turns sorted (score, index)-entries into a tuple of layouts and an array of their scores."""
+    return tuple(layouts[idx] for _, idx in entries), array("d", (score for score, _ in entries))
@@ -0,0 +1,123 @@
+"""Scores the combinations of kept layouts ("prefixes") and the permutations of a new layer
+without scoring every combination from scratch.
+
+The (filtered) bigrams of a combined layout are split into
+- intra-layer bigrams (both letters are in the new layer). Their score only depends on the permutation,
+  so it is calculated once per permutation.
+- cross-layer bigrams (one letter is in the prefix, the other one in the new layer).
+  For every prefix, a table holds the score each new letter would get at each position of the new layer.
+  A combination's cross-layer score is then just the sum of one table entry per position."""
+from array import array
+
+from config import SCORE_LIST, USE_NUMPY
+import numpy_scoring
+
+
+class CombinationScorer:
+    """Scores `prefix + permutation` for prefixes of one length and permutations of one new layer."""
+
+    def __init__(self, prefixLength: int, permutations, bigramTable: tuple, intraScores=None):
+        self.offset = prefixLength
+        self.layerLength = len(permutations[0])
+        self.nrPermutations = len(permutations)
+
+        # Every letter of the new layer gets a row in the cross-tables. (Fill-symbols get rows as well, but they always stay empty)
+        newLetterCodes = sorted(set(ord(letter) for letter in permutations[0]))
+        self.letterRows = {code: row for row, code in enumerate(newLetterCodes)}
+        self.tableSize = len(newLetterCodes) * self.layerLength
+
+        # Split the bigrams
+        self.intraTable = (array("B"), array("B"), array("d"))  # Same format as `bigramTable`
+        self.crossBigrams = []  # (prefix letter code, row of the new letter, frequency, whether the new letter comes first)
+        for code1, code2, frequency in zip(*bigramTable):
+            if code1 in self.letterRows and code2 in self.letterRows:
+                for column, value in zip(self.intraTable, (code1, code2, frequency)):
+                    column.append(value)
+            elif code2 in self.letterRows:
+                self.crossBigrams.append((code1, self.letterRows[code2], frequency, False))
+            elif code1 in self.letterRows:
+                self.crossBigrams.append((code2, self.letterRows[code1], frequency, True))
+
+        # For every permutation, the cross-table entries of its letters. (`row * layerLength + position`)
+        self.tableIndices = tuple(
+            tuple(self.letterRows[ord(letter)]*self.layerLength + position for position, letter in enumerate(permutation))
+            for permutation in permutations)
+
+        if intraScores is None:
+            intraScores = self.getIntraScores(permutations)
+        self.intraScores = intraScores
+
+        if USE_NUMPY:
+            np = numpy_scoring.np
+            # One-hot matrix, so that `crossTables @ selection.T` sums up the right table entries for every permutation.
+            self.selection = np.zeros((self.nrPermutations, self.tableSize), dtype=np.float64)
+            self.selection[np.arange(self.nrPermutations)[:, None], np.array(self.tableIndices)] = 1.0
+            self.intraScoreArray = np.frombuffer(self.intraScores, dtype=np.float64)
+
+    def getIntraScores(self, permutations) -> array:
+        """Scores the intra-layer bigrams of every permutation."""
+        if USE_NUMPY:
+            scores = numpy_scoring.getLayoutScores(permutations, self.intraTable, positionOffset=self.offset)
+            return array("d", scores.tobytes())
+
+        positions = [0]*256
+        intraBigrams = tuple(zip(*self.intraTable))
+        scores = array("d", [0.0]*len(permutations))
+        for k, permutation in enumerate(permutations):
+            for position, letter in enumerate(permutation):
+                positions[ord(letter)] = self.offset + position
+            for code1, code2, frequency in intraBigrams:
+                scores[k] += frequency * SCORE_LIST[positions[code1]][positions[code2]]
+        return scores
+
+    def getCrossTable(self, prefix: str) -> list:
+        """Returns the table of the scores the new letters would get at each position of the new layer (next to `prefix`)."""
+        prefixPositions = dict((ord(letter), position) for position, letter in enumerate(prefix))
+        table = [0.0]*self.tableSize
+        for prefixCode, row, frequency, newLetterFirst in self.crossBigrams:
+            prefixPosition = prefixPositions[prefixCode]
+            tableBeginning = row*self.layerLength
+            for position in range(self.offset, self.offset + self.layerLength):
+                if newLetterFirst:
+                    table[tableBeginning + position - self.offset] += frequency * SCORE_LIST[position][prefixPosition]
+                else:
+                    table[tableBeginning + position - self.offset] += frequency * SCORE_LIST[prefixPosition][position]
+        return table
+
+    def scorePrefixes(self, prefixes, prevScores) -> array:
+        """Returns the scores of all combinations of `prefixes` and the permutations.
+        The combination of `prefixes[i]` and the permutation number `k` is at the index `i * nrOfPermutations + k`."""
+        if USE_NUMPY:
+            np = numpy_scoring.np
+            crossTables = np.array([self.getCrossTable(prefix) for prefix in prefixes], dtype=np.float64)
+            scores = np.asarray(prevScores, dtype=np.float64)[:, None] + self.intraScoreArray[None, :]
+            scores += crossTables @ self.selection.T
+            return array("d", scores.tobytes())
+
+        scores = array("d")
+        for prefix, prevScore in zip(prefixes, prevScores):
+            table = self.getCrossTable(prefix)
+            scores.extend(
+                prevScore + intraScore + sum([table[idx] for idx in indices])
+                for intraScore, indices in zip(self.intraScores, self.tableIndices))
+        return scores
+
+
+class CombinedLayouts:
+    """A read-only sequence of all `prefix + permutation`-layouts. Layouts are only created when they are accessed.
+    The order is the same as the one of `combinePermutations()`."""
+
+    def __init__(self, prefixes, permutations):
+        self.prefixes = prefixes
+        self.permutations = permutations
+
+    def __len__(self) -> int:
+        return len(self.prefixes) * len(self.permutations)
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('layout index out of range')
+        prefixIdx, permutationIdx = divmod(idx, len(self.permutations))
+        return self.prefixes[prefixIdx] + self.permutations[permutationIdx]
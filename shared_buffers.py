@@ -0,0 +1,86 @@
+"""Shares the data of a stage (layouts, previous scores, bigrams, ...) with the worker processes through shared memory.
+Everything is stored in fixed-width buffers once per stage.
+The workers attach to these buffers by name, so only the buffer names and the chunk ranges have to be sent to them."""
+from array import array
+import itertools
+from multiprocessing import shared_memory
+
+
+class SharedStageData:
+    """Owns the shared memory of one stage. Use it as a context manager to make sure the memory is freed again."""
+
+    def __init__(self):
+        self.blocks = []
+        # Everything a worker needs to find and read the buffers: {key: (block name, size in bytes)}
+        # This is what gets sent to the workers.
+        self.descriptor = dict()
+
+    def createBlock(self, key: str, size: int) -> shared_memory.SharedMemory:
+        """Creates a block of shared memory which can be found under `key`."""
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.blocks.append(block)
+        self.descriptor[key] = (block.name, size)
+        return block
+
+    def addBytes(self, key: str, content) -> None:
+        """Stores a bytes-like object (`bytes`, `array`, ...)."""
+        content = memoryview(content).cast('B')
+        block = self.createBlock(key, len(content))
+        block.buf[:len(content)] = content
+
+    def addFloats(self, key: str, values) -> None:
+        """Stores a sequence of floats as doubles."""
+        self.addBytes(key, array("d", values if values else []))
+
+    def addLayouts(self, key: str, layouts, writeChunkSize: int = 100000) -> None:
+        """Stores (asciified) layouts of the same length as fixed-width bytes. (Read them with a `LayoutBuffer`)
+        They are written chunk by chunk, so there never is a second full copy of them."""
+        layoutLength = len(layouts[0])
+        block = self.createBlock(key, len(layouts) * layoutLength)
+        layoutIterator = iter(layouts)
+        for beginning in range(0, len(layouts), writeChunkSize):
+            ending = min(beginning + writeChunkSize, len(layouts))
+            chunk = ''.join(itertools.islice(layoutIterator, ending - beginning))
+            block.buf[beginning*layoutLength:ending*layoutLength] = chunk.encode('latin-1')
+
+    def addBigramTable(self, bigramTable: tuple) -> None:
+        """Stores a bigram table. (See `getBigramTable()` in main.py)"""
+        codes1, codes2, frequencies = bigramTable
+        self.addBytes('codes1', codes1)
+        self.addBytes('codes2', codes2)
+        self.addFloats('frequencies', frequencies)
+
+    def close(self) -> None:
+        """Frees the shared memory."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# The blocks a worker process is currently attached to. (Only the ones of the current stage are kept)
+attachedBlocks = dict()
+
+
+def attach(descriptor: dict) -> dict:
+    """Attaches to the shared memory of a stage (see `SharedStageData.descriptor`) from within a worker process.
+    Returns {key: memoryview} without copying anything."""
+    names = tuple(name for name, _ in descriptor.values())
+    if tuple(attachedBlocks) != names:
+        for block in attachedBlocks.values():
+            block.close()
+        attachedBlocks.clear()
+        for name in names:
+            attachedBlocks[name] = shared_memory.SharedMemory(name=name)
+    return {key: attachedBlocks[name].buf[:size] for key, (name, size) in descriptor.items()}
+
+
+def readBigramTable(buffers: dict) -> tuple:
+    """Reads a bigram table that was stored with `SharedStageData.addBigramTable()`."""
+    return buffers['codes1'], buffers['codes2'], buffers['frequencies'].cast('d')
@@ -0,0 +1,63 @@
+"""Symmetries of the score list.
+
+A symmetry is a permutation of the positions which doesn't change `SCORE_LIST`, like rotating the layout by one sector or mirroring it.
+A layout and its rotated or mirrored versions always get the same score, so only one of them (the "canonical" one) has to be tested.
+Only symmetries which keep every position in its layer are used, because the layouts are built layer by layer."""
+from config import SCORE_LIST, LETTERS_PER_LAYER
+
+
+def getScoreListSymmetries(nrOfPositions: int) -> tuple:
+    """Returns all symmetries of the first `nrOfPositions` positions of `SCORE_LIST` (including the identity).
+    `symmetry[position]` is the position a letter at `position` is moved to."""
+    symmetries = []
+    symmetry = [0]*nrOfPositions
+    used = [False]*nrOfPositions
+
+    def addPosition(position: int) -> None:
+        """Tries every position of the layer for `position` that is consistent with the positions before it."""
+        if position == nrOfPositions:
+            symmetries.append(tuple(symmetry))
+            return
+        layerBeginning = position - position % LETTERS_PER_LAYER
+        for target in range(layerBeginning, min(layerBeginning + LETTERS_PER_LAYER, nrOfPositions)):
+            if used[target] or SCORE_LIST[target][target] != SCORE_LIST[position][position]:
+                continue
+            if all(SCORE_LIST[target][symmetry[other]] == SCORE_LIST[position][other]
+                   and SCORE_LIST[symmetry[other]][target] == SCORE_LIST[other][position] for other in range(position)):
+                symmetry[position] = target
+                used[target] = True
+                addPosition(position + 1)
+                used[target] = False
+
+    addPosition(0)
+    return tuple(symmetries)
+
+
+def getLayerSymmetries(symmetries: tuple, layerNr: int, fixedPositions=()) -> tuple:
+    """Returns the symmetries that can be used for the permutations of layer number `layerNr` (starting at 0):
+    The ones that keep all positions of the previous layers (and the `fixedPositions`) in place.
+    They are restricted to the layer (`layerSymmetry[idx]` is where the letter at the layer's position `idx` is moved) and the identity is left out."""
+    layerBeginning = layerNr * LETTERS_PER_LAYER
+    keptPositions = set(range(layerBeginning)) | set(fixedPositions)
+    layerSymmetries = dict()
+    for symmetry in symmetries:
+        if len(symmetry) < layerBeginning + LETTERS_PER_LAYER:
+            continue
+        if all(symmetry[position] == position for position in keptPositions):
+            layerSymmetry = tuple(symmetry[position] - layerBeginning for position in range(layerBeginning, layerBeginning + LETTERS_PER_LAYER))
+            if layerSymmetry != tuple(range(LETTERS_PER_LAYER)):
+                layerSymmetries[layerSymmetry] = None
+    return tuple(layerSymmetries)
+
+
+def applySymmetry(layerSymmetry: tuple, layout: str) -> str:
+    """Moves the letters of a layer's layout as described by `layerSymmetry`."""
+    letters = ['']*len(layout)
+    for position, letter in enumerate(layout):
+        letters[layerSymmetry[position]] = letter
+    return ''.join(letters)
+
+
+def isCanonical(layout: str, layerSymmetries: tuple) -> bool:
+    """Returns whether `layout` comes first (alphabetically) among all its symmetric versions."""
+    return all(applySymmetry(layerSymmetry, layout) >= layout for layerSymmetry in layerSymmetries)
@@ -0,0 +1,38 @@
+"""Checks how the compiled bigram files count bigrams that appear on multiple lines."""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bigram_corpus
+
+
+class TestBigramCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+        self.path = os.path.join(self.directory.name, 'bigrams.txt')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('ab 5\nth 4\nAb 3\nba 2\n')
+        self.originalDirectory = bigram_corpus.COMPILED_BIGRAMS_DIRECTORY
+        bigram_corpus.COMPILED_BIGRAMS_DIRECTORY = os.path.join(self.directory.name, 'compiled')
+        self.corpus = bigram_corpus.BigramCorpus(self.path)
+
+    def tearDown(self):
+        bigram_corpus.COMPILED_BIGRAMS_DIRECTORY = self.originalDirectory
+        del self.corpus
+        self.directory.cleanup()
+
+    def test_bigrams_sum_up_all_their_lines(self):
+        self.assertEqual(self.corpus.getFrequency('ab'), 8.0)
+        self.assertEqual(self.corpus.getBigramsOf('ab'), [('ab', 8.0), ('ba', 2.0)])
+        self.assertEqual(self.corpus.total, 14.0)
+
+    def test_monograms_take_the_last_line_of_each_bigram(self):
+        # Like `generateMonogramsFromBigramFiles()` always did, so the auto-generated layers don't change.
+        self.assertEqual(list(self.corpus.itemsOfLastLines()), [('ab', 3.0), ('th', 4.0), ('ba', 2.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""Runs a stage with multiprocessing in a fresh interpreter and checks that the shared memory is cleaned up without any warnings."""
+import os
+import subprocess
+import sys
+import unittest
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the fresh interpreter. The pool is created before any shared memory exists (like with `PARALLEL_CYCLES`),
+# then a stage with more layouts than `MULTIPROCESSING_CHUNK_SIZE` is tested through shared memory.
+STAGE_CODE = '''
+import itertools
+import config
+config.USE_MULTIPROCESSING = True
+import main
+
+letters = 'abcdefgh'
+bigrams = tuple(main.Bigram(first + second, (ord(first)*7 + ord(second)) % 11 + 1) for first in letters for second in letters)
+main.getBigrams = lambda sortedLetters, configs=None: bigrams
+main.worker_pool.getPool()
+try:
+    layouts = tuple(''.join(permutation) for permutation in itertools.permutations(letters)) * 2
+    goodLayouts, goodScores = main.testLayouts(layouts)
+    print(len(goodLayouts))
+finally:
+    main.worker_pool.closePool()
+'''
+
+
+class TestSharedMemory(unittest.TestCase):
+
+    def test_multiprocessing_stage_leaves_no_shared_memory_behind(self):
+        process = subprocess.run(
+            [sys.executable, '-c', STAGE_CODE], cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True, timeout=300)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertGreater(int(process.stdout.split()[-1]), 0)
+        self.assertEqual(process.stderr, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""A process pool that is created once per run and shared by all stages that use multiprocessing."""
+import math
+import multiprocessing
+import multiprocessing.pool
+from multiprocessing import resource_tracker
+import os
+
+from config import NR_OF_PROCESSES, MULTIPROCESSING_CHUNK_SIZE
+
+# Holds the pool once it has been created. (Use `getPool()` to access it)
+poolHolder = []
+
+
+def getNrOfProcesses() -> int:
+    """Returns the number of worker processes to use. (`NR_OF_PROCESSES`, or the number of CPU cores if it is 0)"""
+    if NR_OF_PROCESSES > 0:
+        return NR_OF_PROCESSES
+    return os.cpu_count() or 1
+
+
+def getPool() -> multiprocessing.pool.Pool:
+    """Returns the worker pool. It is only created the first time this function is called."""
+    if not poolHolder:
+        # The workers have to share the resource tracker of the main process. If they started their own one (because the pool
+        # was created before any shared memory existed), it would unlink the main process' shared memory and warn about leaks.
+        resource_tracker.ensure_running()
+        poolHolder.append(multiprocessing.Pool(processes=getNrOfProcesses()))
+    return poolHolder[0]
+
+
+def closePool() -> None:
+    """Shuts the worker pool down, if there is one."""
+    if poolHolder:
+        pool = poolHolder.pop()
+        pool.close()
+        pool.join()
+
+
+def getChunkRanges(nrItems: int, maxChunkSize: int = MULTIPROCESSING_CHUNK_SIZE) -> list:
+    """Splits `nrItems` items into (beginning, ending)-ranges for the worker processes.
+    There are at least 4 chunks per process (if possible), so that no process sits idle while the last chunks are being worked on."""
+    chunkSize = min(maxChunkSize, math.ceil(nrItems / (getNrOfProcesses() * 4)))
+    chunkSize = max(chunkSize, 1)
+    return [(beginning, min(beginning + chunkSize, nrItems)) for beginning in range(0, nrItems, chunkSize)]
+
+
+def isWorkerProcess() -> bool:
+    """Returns whether this is one of the pool's worker processes. (Those can't hand work to a pool of their own)"""
+    return multiprocessing.parent_process() is not None